@@ -2,12 +2,2005 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import ttkbootstrap as ttkb
 from ttkbootstrap.constants import *
+import os
+import re
+import sys
+import json
+import time
 import math
-import numpy as np
+import decimal
+import argparse
+import operator
+import multiprocessing
+from array import array
+from collections import ChainMap, deque
+from contextlib import nullcontext
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+from itertools import islice
 from datetime import datetime
 
+# Expression engine
+class ExpressionError(ValueError):
+    """A syntax or name error in a calculator expression."""
+
+TOKEN_RE = re.compile(r"\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|(?P<name>[A-Za-z_]\w*)"
+                      r"|(?P<op>\*\*|[-+*/^(),]))")
+
+# Binary operators: token -> (binding power, right associative)
+BINARY_OPERATORS = {
+    "+": (10, False),
+    "-": (10, False),
+    "*": (20, False),
+    "/": (20, False),
+    "**": (40, True),
+    "^": (40, True),
+}
+UNARY_BINDING = 30  # between * and **, so -2**2 == -(2**2) as in Python
+
+def bounded_power(base, exponent):
+    """base ** exponent, refusing an integer power too large to compute in reasonable time and memory.
+
+    Every other operator grows its result by at most the size of its
+    operands, so this is the one place an expression such as 9**9**9 can
+    explode; the size is estimated from the operands before any work.
+    """
+    if is_huge_power(base, exponent, MAX_EXACT_BITS):
+        raise OverflowError(f"Result too large: about {int(power_bits(base, exponent) * math.log10(2)):,} digits")
+    return base ** exponent
+
+OPERATIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "**": bounded_power,
+    "^": bounded_power,
+    "neg": operator.neg,
+}
+
+# Trigonometric functions take degrees, like the calculator always has
+FUNCTIONS = {
+    "sin": lambda x: math.sin(math.radians(x)),
+    "cos": lambda x: math.cos(math.radians(x)),
+    "tan": lambda x: math.tan(math.radians(x)),
+    "sqrt": math.sqrt,
+    "log10": math.log10,
+    "ln": math.log,
+    "abs": abs,
+}
+
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+def float_literal(text):
+    """Read a number token: integers stay exact, anything with a point or exponent is a float."""
+    return float(text) if any(c in text for c in ".eE") else int(text)
+
+class NumberSystem:
+    """The number representation of one precision mode.
+
+    literal reads a number token, operations and functions implement the
+    operators (plus "neg") and calls, finish, if set, normalizes the final
+    result, and inexact, if set, converts an approximate float answer from
+    the numeric tools into the mode's numbers.
+    """
+    __slots__ = ("name", "literal", "operations", "functions", "constants", "finish", "inexact")
+
+    def __init__(self, name, literal, operations, functions, constants, finish=None, inexact=None):
+        self.name = name
+        self.literal = literal
+        self.operations = operations
+        self.functions = functions
+        self.constants = constants
+        self.finish = finish
+        self.inexact = inexact
+
+FLOAT_NUMBERS = NumberSystem("float", float_literal, OPERATIONS, FUNCTIONS, CONSTANTS)
+
+@lru_cache(maxsize=None)
+def vector_numbers():
+    """The float functions over NumPy arrays, for evaluating a whole range at once.
+
+    Built on first use so that NumPy is only imported once a table or plot is asked for.
+    """
+    import numpy as np
+    functions = {
+        "sin": lambda x: np.sin(np.radians(x)),
+        "cos": lambda x: np.cos(np.radians(x)),
+        "tan": lambda x: np.tan(np.radians(x)),
+        "sqrt": np.sqrt,
+        "log10": np.log10,
+        "ln": np.log,
+        "abs": np.abs,
+    }
+    return NumberSystem("vector", float_literal, OPERATIONS, functions, CONSTANTS)
+
+def tokenize(text):
+    """Split an expression into (kind, value, position) tokens, ending with an "end" token."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None:
+            raise ExpressionError(f"Unexpected character {text[position:].lstrip()[0]!r} at position {position + 1}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind), match.start(kind)))
+        position = match.end()
+    tokens.append(("end", "", len(text)))
+    return tokens
+
+class Parser:
+    """Pratt parser from tokens to a tuple AST, folding constant sub-expressions as it goes.
+
+    Pass folding=False to keep the tree as written, and user_functions to
+    accept calls to those names (see Worksheet). Nodes are ("num", value), ("name", name), ("neg", operand),
+    ("bin", operator, left, right), ("call", function, args) and
+    ("tool", name, body, variable, args) for the numeric tools. Being plain
+    tuples they compare and hash by structure.
+    """
+    def __init__(self, text, numbers=FLOAT_NUMBERS, folding=True, user_functions=()):
+        self.tokens = tokenize(text)
+        self.numbers = numbers
+        self.folding = folding
+        self.user_functions = user_functions
+        self.index = 0
+
+    def fold(self, node):
+        return fold(node, self.numbers) if self.folding else node
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, value):
+        kind, text, position = self.advance()
+        if text != value:
+            found = f"{text!r}" if kind != "end" else "end of expression"
+            raise ExpressionError(f"Expected {value!r} but found {found} at position {position + 1}")
+
+    def parse(self):
+        node = self.expression(0)
+        kind, text, position = self.peek()
+        if kind != "end":
+            raise ExpressionError(f"Unexpected {text!r} at position {position + 1}")
+        return node
+
+    def expression(self, right_binding):
+        left = self.prefix()
+        while True:
+            kind, text, position = self.peek()
+            if kind != "op" or text not in BINARY_OPERATORS:
+                return left
+            binding, right_associative = BINARY_OPERATORS[text]
+            if binding <= right_binding:
+                return left
+            self.advance()
+            right = self.expression(binding - 1 if right_associative else binding)
+            left = self.fold(("bin", "**" if text == "^" else text, left, right))
+
+    def prefix(self):
+        kind, text, position = self.advance()
+        if kind == "number":
+            return ("num", self.numbers.literal(text))
+        if kind == "name":
+            if self.peek()[1] == "(":
+                return self.call(text, position)
+            if text in self.numbers.constants:
+                return ("num", self.numbers.constants[text])
+            return ("name", text)
+        if text == "(":
+            node = self.expression(0)
+            self.expect(")")
+            return node
+        if text == "-":
+            return self.fold(("neg", self.expression(UNARY_BINDING)))
+        if text == "+":
+            return self.expression(UNARY_BINDING)
+        if kind == "end":
+            raise ExpressionError("Unexpected end of expression")
+        raise ExpressionError(f"Unexpected {text!r} at position {position + 1}")
+
+    def call(self, name, position):
+        if name in NUMERIC_TOOLS:
+            return self.numeric_tool(name, position)
+        if name not in self.numbers.functions and name not in self.user_functions:
+            raise ExpressionError(f"Unknown function {name!r} at position {position + 1}")
+        self.expect("(")
+        args = [self.expression(0)]
+        while self.peek()[1] == ",":
+            self.advance()
+            args.append(self.expression(0))
+        self.expect(")")
+        node = ("call", name, tuple(args))
+        # A user function can be redefined, so its calls are never folded
+        return node if name in self.user_functions else self.fold(node)
+
+    def numeric_tool(self, name, position):
+        """Parse solve/integrate/derivative(expression, variable, numbers...) into a ("tool", ...) node."""
+        self.expect("(")
+        body = self.expression(0)
+        self.expect(",")
+        kind, variable, variable_position = self.advance()
+        if kind != "name" or variable in self.numbers.constants:
+            raise ExpressionError(f"Expected a variable name at position {variable_position + 1}, "
+                                  f"as in {name}({NUMERIC_TOOLS[name][1]})")
+        args = []
+        while self.peek()[1] == ",":
+            self.advance()
+            args.append(self.expression(0))
+        self.expect(")")
+        if len(args) != NUMERIC_TOOLS[name][0]:
+            raise ExpressionError(f"{name} at position {position + 1} takes the form {name}({NUMERIC_TOOLS[name][1]})")
+        return ("tool", name, body, variable, tuple(args))
+
+def fold(node, numbers=FLOAT_NUMBERS):
+    """Replace a node whose operands are all numbers by its value.
+
+    Errors such as 1/0 are left in the tree, so they surface when the
+    expression is evaluated, the same as for non-constant operands. So are
+    integer powers too large to compute in the time of a keystroke.
+    """
+    kind = node[0]
+    if kind == "bin":
+        operands = node[2:]
+        if node[1] == "**" and is_huge_power(node[2][1], node[3][1]):
+            return node
+    elif kind == "neg":
+        operands = node[1:]
+    else:
+        operands = node[2]
+    if not all(operand[0] == "num" for operand in operands):
+        return node
+    values = [operand[1] for operand in operands]
+    try:
+        if kind == "bin":
+            return ("num", numbers.operations[node[1]](*values))
+        if kind == "neg":
+            return ("num", numbers.operations["neg"](*values))
+        return ("num", numbers.functions[node[1]](*values))
+    except (ArithmeticError, ValueError):
+        return node
+
+def compile_node(node, numbers=FLOAT_NUMBERS):
+    """Turn an AST node into a closure taking a dict of variable values.
+
+    numbers supplies the implementations of operators and calls, e.g.
+    vector_numbers() to evaluate over NumPy arrays.
+    """
+    kind = node[0]
+    if kind == "num":
+        value = node[1]
+        return lambda env: value
+    if kind == "name":
+        name = node[1]
+
+        def variable(env):
+            try:
+                return env[name]
+            except KeyError:
+                raise ExpressionError(f"Unknown variable {name!r}") from None
+        return variable
+    if kind == "tool":
+        return compile_tool(node, numbers)
+    if kind == "neg":
+        negate = numbers.operations["neg"]
+        operand = compile_node(node[1], numbers)
+        return lambda env: negate(operand(env))
+    if kind == "bin":
+        operation = numbers.operations[node[1]]
+        left = compile_node(node[2], numbers)
+        right = compile_node(node[3], numbers)
+        return lambda env: operation(left(env), right(env))
+    function = numbers.functions.get(node[1])
+    args = [compile_node(arg, numbers) for arg in node[2]]
+    if function is None:
+        # A user function, looked up in env at call time so redefinitions take effect
+        name = node[1]
+        return lambda env: env[name](*(arg(env) for arg in args))
+    if len(args) == 1:
+        arg = args[0]
+        return lambda env: function(arg(env))
+    return lambda env: function(*(arg(env) for arg in args))
+
+def free_names(node):
+    """The variable names an AST refers to."""
+    if node[0] == "name":
+        return {node[1]}
+    if node[0] == "num":
+        return set()
+    if node[0] == "tool":
+        # The tool's variable is bound inside its body
+        return (free_names(node[2]) - {node[3]}).union(*(free_names(arg) for arg in node[4]))
+    children = node[2] if node[0] == "call" else node[1:] if node[0] == "neg" else node[2:]
+    return set().union(*(free_names(child) for child in children))
+
+def called_functions(node):
+    """The names of the functions an AST calls."""
+    if node[0] in ("num", "name"):
+        return set()
+    if node[0] == "call":
+        return {node[1]}.union(*(called_functions(arg) for arg in node[2]))
+    if node[0] == "tool":
+        return called_functions(node[2]).union(*(called_functions(arg) for arg in node[4]))
+    children = node[1:] if node[0] == "neg" else node[2:]
+    return set().union(*(called_functions(child) for child in children))
+
+class CompiledExpression:
+    """A parsed expression ready to evaluate; call it with a dict of variable values."""
+    __slots__ = ("text", "numbers", "tree", "names", "function", "vector_function")
+
+    def __init__(self, text, numbers=FLOAT_NUMBERS):
+        self.text = text
+        self.numbers = numbers
+        self.tree = Parser(text, numbers).parse()
+        self.names = frozenset(free_names(self.tree))
+        self.function = compile_node(self.tree, numbers)
+        if numbers.finish is not None:
+            self.function = finishing(self.function, numbers.finish)
+        self.vector_function = None
+
+    def __call__(self, env=None):
+        return self.function(env or {})
+
+    def vectorized(self):
+        """The same expression compiled over NumPy arrays, built on first use."""
+        if self.vector_function is None:
+            numbers = vector_numbers()
+            self.vector_function = compile_node(Parser(self.text, numbers).parse(), numbers)
+        return self.vector_function
+
+def finishing(function, finish):
+    """Wrap a compiled expression so its result is normalized and decimal signals become plain errors."""
+    def finished(env):
+        try:
+            return finish(function(env))
+        except decimal.DivisionByZero:
+            raise ZeroDivisionError("division by zero") from None
+        except decimal.Overflow:
+            raise OverflowError("Result too large") from None
+        except decimal.InvalidOperation:
+            raise ValueError("Result is undefined") from None
+    return finished
+
+@lru_cache(maxsize=512)
+def compile_expression(text, mode="float", digits=None):
+    """Parse and compile an expression, memoized so re-evaluating the same text skips parsing."""
+    return CompiledExpression(text, number_system(mode, digits))
+
+def evaluate(text, env=None, mode="float", digits=None):
+    """Evaluate an expression with the calculator's semantics (degree-based trig, Python number rules).
+
+    mode is one of NUMBER_MODES; digits sets the significant digits of the
+    "decimal" mode and of any irrational result in the "fraction" mode.
+    """
+    return compile_expression(text.strip(), mode, digits)(env)
+
+DISPLAY_MAX_DIGITS = 10_000  # longer integers are displayed in scientific form
+
+def format_result(value, max_digits=None):
+    """A result as text, with exact integers in full even past the length str() refuses.
+
+    With max_digits, a longer integer is shortened to scientific form
+    instead, since writing out every digit is quadratic in their number.
+    """
+    if isinstance(value, Fraction):
+        return f"{format_result(value.numerator, max_digits)}/{format_result(value.denominator, max_digits)}"
+    # str() is limited to 4300 digits, about 14,300 bits
+    if type(value) is not int or value.bit_length() <= 14_000:
+        return str(value)
+    exponent = math.log10(abs(value))
+    if max_digits is not None and exponent >= max_digits:
+        mantissa = f"{10 ** (exponent % 1):.12f}".rstrip("0").rstrip(".")
+        return f"{'-' if value < 0 else ''}{mantissa}e+{int(exponent)}"
+    return f"{Decimal(value):f}"
+
+# Precision modes
+NUMBER_MODES = ("float", "decimal", "fraction")
+DEFAULT_DIGITS = 28
+MAX_DIGITS = 500
+GUARD_DIGITS = 10
+MAX_EXACT_BITS = 1_000_000  # past this an exact power falls back to rounded decimal
+MAX_FOLD_BITS = 100_000
+
+@lru_cache(maxsize=None)
+def number_system(mode, digits=None):
+    """The NumberSystem for a precision mode, built once per mode and digit count."""
+    if mode == "float":
+        return FLOAT_NUMBERS
+    digits = DEFAULT_DIGITS if digits is None else digits
+    if not 1 <= digits <= MAX_DIGITS:
+        raise ValueError(f"Digits must be between 1 and {MAX_DIGITS}")
+    if mode == "decimal":
+        return decimal_numbers(decimal.Context(prec=digits))
+    if mode == "fraction":
+        return fraction_numbers(decimal.Context(prec=digits))
+    raise ValueError(f"Unknown mode {mode!r}; expected one of {', '.join(NUMBER_MODES)}")
+
+def as_decimal(x, context):
+    """Convert an int, Fraction or float to a Decimal rounded to context.
+
+    A Decimal passes through unrounded: the context operations round only
+    their result, so the guard digits of constants and functions count.
+    """
+    if isinstance(x, Decimal):
+        return x
+    if isinstance(x, Fraction):
+        return context.divide(Decimal(x.numerator), x.denominator)
+    if isinstance(x, float):
+        return context.create_decimal(repr(x))
+    return context.create_decimal(x)
+
+def as_fraction(x):
+    """Convert a float to the Fraction it prints as; ints and Fractions pass through."""
+    return Fraction(repr(x)) if isinstance(x, float) else x
+
+def exact_result(x):
+    """A Fraction with denominator 1 as an int, the cheapest exact representation."""
+    return x.numerator if isinstance(x, Fraction) and x.denominator == 1 else x
+
+def power_bits(base, exponent):
+    """Rough size in bits of base ** exponent for an integer exponent."""
+    base = Fraction(base)
+    return abs(exponent) * max(base.numerator.bit_length(), base.denominator.bit_length())
+
+def is_huge_power(base, exponent, limit=MAX_FOLD_BITS):
+    """Whether base ** exponent is an exact integer power of more than limit bits."""
+    return type(base) is int and type(exponent) is int and exponent > 0 and power_bits(base, exponent) > limit
+
+def integer_root(a, n):
+    """The exact n-th root of a non-negative int, or None if it is not a perfect power."""
+    # A root of 2 or more needs more than n bits, so this also bounds the work for huge n
+    if a.bit_length() <= n:
+        return a if a in (0, 1) else None
+    root = 1 << -(-a.bit_length() // n)
+    while True:
+        better = ((n - 1) * root + a // root ** (n - 1)) // n
+        if better >= root:
+            break
+        root = better
+    return root if root ** n == a else None
+
+def exact_root(x, n):
+    """The exact n-th root of an int or Fraction, or None if it is irrational."""
+    x = Fraction(x)
+    if x < 0:
+        if n % 2 == 0:
+            return None
+        root = exact_root(-x, n)
+        return None if root is None else -root
+    numerator = integer_root(x.numerator, n)
+    denominator = integer_root(x.denominator, n)
+    if numerator is None or denominator is None:
+        return None
+    return exact_result(Fraction(numerator, denominator))
+
+# Sines and tangents that are rational, by angle in degrees
+EXACT_SINES = {0: 0, 30: Fraction(1, 2), 90: 1, 150: Fraction(1, 2),
+               180: 0, 210: Fraction(-1, 2), 270: -1, 330: Fraction(-1, 2)}
+EXACT_TANGENTS = {0: 0, 45: 1, 135: -1, 180: 0, 225: 1, 315: -1}
+
+def exact_trig(name, degrees):
+    """sin, cos or tan of an exact angle as an int or Fraction, or None if the value is irrational."""
+    degrees = Fraction(degrees) % 360
+    if name == "cos":
+        name, degrees = "sin", (degrees + 90) % 360
+    if name == "sin":
+        return EXACT_SINES.get(degrees)
+    if degrees in (90, 270):
+        raise ValueError(f"tan is undefined at {degrees} degrees")
+    return EXACT_TANGENTS.get(degrees)
+
+@lru_cache(maxsize=16)
+def decimal_pi(digits):
+    """pi to digits significant digits, by the series in the decimal module's documentation."""
+    context = decimal.Context(prec=digits + 2)
+    last, t, total, n, na, d, da = 0, Decimal(3), Decimal(3), 1, 0, 0, 24
+    while total != last:
+        last = total
+        n, na = n + na, na + 8
+        d, da = d + da, da + 32
+        t = context.divide(context.multiply(t, n), d)
+        total = context.add(total, t)
+    return decimal.Context(prec=digits).plus(total)
+
+def taylor_series(x, term, context):
+    """Sum the sine (term=x) or cosine (term=1) series of x radians until it stops changing."""
+    square = context.multiply(x, x)
+    total = term
+    k = 1 if term == x else 0
+    while True:
+        term = context.minus(context.divide(context.multiply(term, square), (k + 1) * (k + 2)))
+        k += 2
+        following = context.add(total, term)
+        if following == total:
+            return total
+        total = following
+
+def decimal_trig(name, degrees, context):
+    """sin, cos or tan of an angle in degrees, to context.prec + GUARD_DIGITS digits.
+
+    Rational values are exact; the rest are summed with GUARD_DIGITS extra
+    digits, which the next operation or finish() rounds away once.
+    """
+    exact = exact_trig(name, degrees)
+    if exact is not None:
+        return as_decimal(exact, context)
+    work = decimal.Context(prec=context.prec + GUARD_DIGITS)
+    # Reduce to (-180, 180] exactly before converting, so the series converges quickly
+    reduced = Fraction(degrees) % 360
+    if reduced > 180:
+        reduced -= 360
+    radians = work.divide(work.multiply(as_decimal(reduced, work), decimal_pi(work.prec)), 180)
+    sine = taylor_series(radians, radians, work)
+    if name == "sin":
+        return work.plus(sine)
+    cosine = taylor_series(radians, Decimal(1), work)
+    return work.plus(cosine if name == "cos" else work.divide(sine, cosine))
+
+def decimal_function(name, context):
+    """A scientific function over Decimals, keeping GUARD_DIGITS extra digits like the constants.
+
+    So ln(e) and sqrt(2)**2 round to exactly 1 and 2 rather than one ulp short.
+    """
+    if name in ("sin", "cos", "tan"):
+        return lambda x: decimal_trig(name, x, context)
+    if name == "abs":
+        return lambda x: x if isinstance(x, int) and x >= 0 else context.abs(as_decimal(x, context))
+    work = decimal.Context(prec=context.prec + GUARD_DIGITS)
+    method = {"sqrt": work.sqrt, "log10": work.log10, "ln": work.ln}[name]
+
+    def function(x):
+        if x < 0 or (x == 0 and name != "sqrt"):
+            raise ValueError("math domain error")
+        return method(as_decimal(x, work))
+    return function
+
+def decimal_numbers(context):
+    """Decimal mode: integers stay exact ints until an operation needs rounding, the rest is Decimal."""
+    def both_int(a, b):
+        return type(a) is int and type(b) is int
+
+    def add(a, b):
+        return a + b if both_int(a, b) else context.add(as_decimal(a, context), as_decimal(b, context))
+
+    def subtract(a, b):
+        return a - b if both_int(a, b) else context.subtract(as_decimal(a, context), as_decimal(b, context))
+
+    def multiply(a, b):
+        return a * b if both_int(a, b) else context.multiply(as_decimal(a, context), as_decimal(b, context))
+
+    def divide(a, b):
+        if both_int(a, b) and b and a % b == 0:
+            return a // b
+        return context.divide(as_decimal(a, context), as_decimal(b, context))
+
+    def power(a, b):
+        if a == 0 and b < 0:
+            raise ZeroDivisionError("0 cannot be raised to a negative power")
+        # An exact power only while it fits in the requested digits; beyond that, rounding is cheaper
+        if both_int(a, b) and 0 <= b and power_bits(a, b) <= 4 * context.prec:
+            return a ** b
+        return context.power(as_decimal(a, context), as_decimal(b, context))
+
+    def negate(a):
+        return -a if type(a) is int else context.minus(as_decimal(a, context))
+
+    def finish(x):
+        if not isinstance(x, Decimal):
+            return x
+        if not x.is_finite():
+            raise OverflowError("Result too large")
+        x = context.plus(x).normalize(context)
+        # Show whole numbers that fit in the digits without an exponent: 100, not 1E+2
+        if x.as_tuple().exponent > 0 and x.adjusted() < context.prec:
+            x = x.quantize(Decimal(1), context=context)
+        return x
+
+    operations = {"+": add, "-": subtract, "*": multiply, "/": divide, "**": power, "^": power, "neg": negate}
+    functions = {name: decimal_function(name, context) for name in FUNCTIONS}
+    # Constants carry guard digits, as function results do, and lose them only to the next rounding
+    precise = decimal.Context(prec=context.prec + GUARD_DIGITS)
+    constants = {"pi": decimal_pi(precise.prec), "e": precise.exp(1)}
+    return NumberSystem("decimal", Decimal, operations, functions, constants, finish,
+                        lambda x: as_decimal(x, context))
+
+def fraction_numbers(context):
+    """Fraction mode: exact rationals, with irrational values rounded to context as Decimals.
+
+    Once a Decimal enters a calculation the rest of it is done in Decimal,
+    so an inexact result always shows as a decimal rather than a fraction.
+    """
+    rounded = decimal_numbers(context)
+
+    def mixed(exact, inexact):
+        def operation(a, b):
+            if isinstance(a, Decimal) or isinstance(b, Decimal):
+                return inexact(a, b)
+            return exact(as_fraction(a), as_fraction(b))
+        return operation
+
+    def divide(a, b):
+        if b == 0:
+            raise ZeroDivisionError("division by zero")
+        return exact_result(Fraction(a) / b)
+
+    def power(a, b):
+        if a == 0 and b < 0:
+            raise ZeroDivisionError("0 cannot be raised to a negative power")
+        b = exact_result(b)
+        if isinstance(b, int):
+            if power_bits(a, b) <= MAX_EXACT_BITS:
+                return exact_result(Fraction(a) ** b)
+        elif a >= 0 or b.denominator % 2:
+            root = exact_root(a, b.denominator)
+            if root is not None and power_bits(root, b.numerator) <= MAX_EXACT_BITS:
+                return exact_result(Fraction(root) ** b.numerator)
+        return rounded.operations["**"](a, b)
+
+    def exact_or_rounded(name, exact):
+        inexact = rounded.functions[name]
+
+        def function(x):
+            value = None if isinstance(x, Decimal) else exact(as_fraction(x))
+            return inexact(x) if value is None else value
+        return function
+
+    def log10(x):
+        x = Fraction(x)
+        if x > 0 and 1 in (x.numerator, x.denominator):
+            whole = max(x.numerator, x.denominator)
+            digits = len(str(whole)) - 1
+            if whole == 10 ** digits:
+                return digits if x >= 1 else -digits
+        return None
+
+    operations = {
+        "+": mixed(operator.add, rounded.operations["+"]),
+        "-": mixed(operator.sub, rounded.operations["-"]),
+        "*": mixed(operator.mul, rounded.operations["*"]),
+        "/": mixed(divide, rounded.operations["/"]),
+        "**": mixed(power, rounded.operations["**"]),
+        "neg": lambda a: rounded.operations["neg"](a) if isinstance(a, Decimal) else -as_fraction(a),
+    }
+    operations["^"] = operations["**"]
+    functions = {
+        "sin": exact_or_rounded("sin", lambda x: exact_trig("sin", x)),
+        "cos": exact_or_rounded("cos", lambda x: exact_trig("cos", x)),
+        "tan": exact_or_rounded("tan", lambda x: exact_trig("tan", x)),
+        "sqrt": exact_or_rounded("sqrt", lambda x: exact_root(x, 2)),
+        "log10": exact_or_rounded("log10", log10),
+        "ln": exact_or_rounded("ln", lambda x: 0 if x == 1 else None),
+        "abs": lambda x: abs(x),
+    }
+    return NumberSystem("fraction", lambda text: exact_result(Fraction(text)), operations, functions,
+                        rounded.constants, lambda x: rounded.finish(x) if isinstance(x, Decimal) else exact_result(x),
+                        rounded.inexact)
+
+# Numeric tools: solve, integrate and derivative
+# name -> (number of arguments after the variable, usage)
+NUMERIC_TOOLS = {
+    "solve": (2, "expression, x, from, to"),
+    "integrate": (2, "expression, x, from, to"),
+    "derivative": (1, "expression, x, at"),
+}
+SOLVE_SAMPLES = 1025
+SOLVE_SPLIT = 64  # points per bracketing pass; each pass narrows the bracket 65-fold
+INTEGRATE_RTOL = 1e-10
+INTEGRATE_ATOL = 1e-12
+INTEGRATE_MAX_INTERVALS = 100_000
+INTEGRATE_MAX_LEVELS = 100
+
+# 15-point Gauss-Kronrod rule on [-1, 1]; its 7 Gauss points give the error estimate
+KRONROD_NODES = (0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+                 0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+                 0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                 0.207784955007898467600689403773245, 0.0)
+KRONROD_WEIGHTS = (0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+                   0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+                   0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+                   0.204432940075298892414161999234649, 0.209482141084727828012999174891714)
+GAUSS_WEIGHTS = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+                 0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+@lru_cache(maxsize=None)
+def gauss_kronrod():
+    """The 15 nodes and the Kronrod and Gauss weight vectors of the rule, as NumPy arrays."""
+    import numpy as np
+    half = np.array(KRONROD_NODES[:7])
+    nodes = np.concatenate([-half, [0.0], half[::-1]])
+    kronrod = np.concatenate([KRONROD_WEIGHTS[:7], KRONROD_WEIGHTS[7:], KRONROD_WEIGHTS[6::-1]])
+    gauss = np.zeros(15)
+    gauss[[1, 3, 5]] = gauss[[13, 11, 9]] = GAUSS_WEIGHTS[:3]
+    gauss[7] = GAUSS_WEIGHTS[3]
+    return nodes, kronrod, gauss
+
+def integrate_samples(f, a, b):
+    """Integrate f from a to b by adaptive Gauss-Kronrod quadrature.
+
+    f takes and returns NumPy arrays. Every pass evaluates the nodes of all
+    intervals still being refined in a single call, then halves the ones
+    whose error estimate exceeds their share of the tolerance.
+    """
+    import numpy as np
+    if a == b:
+        return 0.0
+    sign = 1.0
+    if a > b:
+        a, b, sign = b, a, -1.0
+    if not np.isfinite(b - a):
+        raise ValueError("integrate: the interval is too wide")
+    nodes, kronrod, gauss = gauss_kronrod()
+    # Sums near the float limits can overflow; the isfinite checks below report it instead
+    with np.errstate(over="ignore", invalid="ignore"):
+        lows, highs = np.array([a]), np.array([b])
+        total = error = 0.0
+        for _ in range(INTEGRATE_MAX_LEVELS):
+            centers, halves = (lows + highs) / 2, (highs - lows) / 2
+            ys = f(centers[:, None] + halves[:, None] * nodes)
+            if not np.all(np.isfinite(ys)):
+                raise ValueError("integrate: the expression is undefined or infinite on the interval")
+            estimates = ys @ kronrod * halves
+            errors = np.abs(estimates - ys @ gauss * halves)
+            if not (np.all(np.isfinite(estimates)) and np.all(np.isfinite(errors))):
+                raise ValueError("integrate: the integral is too large to compute")
+            tolerance = max(INTEGRATE_ATOL, INTEGRATE_RTOL * abs(total + estimates.sum()))
+            if error + errors.sum() <= tolerance:
+                return sign * (total + estimates.sum())
+            # Intervals too narrow to split any further are accepted as they are
+            refine = (errors > tolerance * halves / ((b - a) / 2)) & (halves > 1e-15 * np.abs(centers))
+            if not refine.any():
+                refine = errors == errors.max()
+            total += estimates[~refine].sum()
+            error += errors[~refine].sum()
+            lows, highs, centers = lows[refine], highs[refine], centers[refine]
+            if 2 * len(lows) > INTEGRATE_MAX_INTERVALS:
+                break
+            lows, highs = np.concatenate([lows, centers]), np.concatenate([centers, highs])
+    raise ValueError("integrate: did not converge; the expression may oscillate or be singular")
+
+def solve_samples(f, a, b):
+    """The smallest root of f in [a, b].
+
+    Sign changes are located on an even grid in one call, then each
+    bracket is narrowed by evaluating SOLVE_SPLIT points inside it per
+    call. A sign change across a pole, such as tan at 90, is skipped.
+    """
+    import numpy as np
+    if a > b:
+        a, b = b, a
+    if not np.isfinite(b - a):
+        raise ValueError("solve: the interval is too wide")
+    xs = np.linspace(a, b, SOLVE_SAMPLES)
+    ys = f(xs)
+    finite = np.isfinite(ys)
+    scale = max(1.0, float(np.max(np.abs(ys[finite])))) if finite.any() else 1.0
+    zeros = np.flatnonzero(ys == 0)
+    brackets = np.flatnonzero(finite[:-1] & finite[1:] & (np.sign(ys[:-1]) * np.sign(ys[1:]) < 0))
+    for i in sorted(set(brackets) | set(zeros)):
+        if ys[i] == 0:
+            return float(xs[i])
+        lo, hi, f_lo = xs[i], xs[i + 1], ys[i]
+        while hi - lo > 4 * np.finfo(float).eps * max(abs(lo), abs(hi)) and lo < (lo + hi) / 2 < hi:
+            points = np.linspace(lo, hi, SOLVE_SPLIT + 2)
+            values = np.concatenate([[f_lo], f(points[1:-1]), [np.nan]])
+            exact = np.flatnonzero(values[1:-1] == 0)
+            if exact.size:
+                return float(points[1 + exact[0]])
+            values[-1] = -np.sign(f_lo)  # sign at hi is known to differ from f_lo
+            change = np.flatnonzero(np.sign(values[:-1]) * np.sign(values[1:]) < 0)[0]
+            lo, hi, f_lo = points[change], points[change + 1], values[change]
+        root = (lo + hi) / 2
+        if abs(float(f(np.array([root]))[0])) <= 1e-6 * scale:
+            return float(root)
+    raise ValueError(f"solve: no root found between {a:g} and {b:g}")
+
+def derivative_samples(f, x):
+    """The derivative of f at x by Ridders' method: central differences at shrinking steps, extrapolated.
+
+    All the steps are evaluated in one call.
+    """
+    import numpy as np
+    levels, shrink = 12, 1.4
+    steps = 0.1 * max(1.0, abs(x)) / shrink ** np.arange(levels)
+    ys = f(np.concatenate([x + steps, x - steps]))
+    if not np.all(np.isfinite(ys)):
+        raise ValueError("derivative: the expression is undefined near the point")
+    central = (ys[:levels] - ys[levels:]) / (2 * steps)
+    best, best_error = central[0], np.inf
+    previous = [central[0]]
+    for i in range(1, levels):
+        row = [central[i]]
+        factor = shrink ** 2
+        for j in range(1, i + 1):
+            row.append((row[j - 1] * factor - previous[j - 1]) / (factor - 1))
+            factor *= shrink ** 2
+            error = max(abs(row[j] - row[j - 1]), abs(row[j] - previous[j - 1]))
+            if error <= best_error:
+                best, best_error = row[j], error
+        # Once extrapolation starts losing accuracy to rounding, further steps only get worse
+        if abs(row[i] - previous[i - 1]) >= 2 * best_error:
+            break
+        previous = row
+    return float(best)
+
+NUMERIC_METHODS = {"solve": solve_samples, "integrate": integrate_samples, "derivative": derivative_samples}
+
+def float_tree(node):
+    """A copy of an AST with every number as a float, for evaluating over NumPy arrays."""
+    kind = node[0]
+    if kind == "num":
+        return ("num", float(node[1]))
+    if kind == "name":
+        return node
+    if kind == "neg":
+        return ("neg", float_tree(node[1]))
+    if kind == "bin":
+        return ("bin", node[1], float_tree(node[2]), float_tree(node[3]))
+    if kind == "call":
+        return ("call", node[1], tuple(float_tree(arg) for arg in node[2]))
+    return ("tool", node[1], float_tree(node[2]), node[3], tuple(float_tree(arg) for arg in node[4]))
+
+def compile_tool(node, numbers):
+    """Compile a numeric tool node.
+
+    The body is compiled once over NumPy arrays, so each sampling pass of
+    the method is a single vectorized evaluation. A body that cannot take
+    arrays, e.g. one calling a user function, is sampled point by point.
+    """
+    _, name, body, variable, args = node
+    method = NUMERIC_METHODS[name]
+    bounds = [compile_node(arg, numbers) for arg in args]
+    vector_body = compile_node(float_tree(body), vector_numbers())
+    scalar_body = compile_node(body, numbers)
+    inexact = numbers.inexact or float
+
+    def run(env, values):
+        import numpy as np
+        # Other variables enter the NumPy arithmetic as floats
+        float_env = {key: value if callable(value) else float(value) for key, value in env.items()}
+
+        def scalar(x):
+            try:
+                return float(scalar_body(ChainMap({variable: x}, env)))
+            except (ArithmeticError, ValueError):
+                return np.nan
+
+        def f(xs):
+            with np.errstate(all="ignore"):
+                try:
+                    ys = vector_body(ChainMap({variable: xs}, float_env))
+                except TypeError:
+                    ys = np.vectorize(scalar, otypes=[float])(xs)
+            return np.broadcast_to(np.asarray(ys, dtype=float), np.shape(xs))
+        values = [float(value) for value in values]
+        if not all(math.isfinite(value) for value in values):
+            raise ValueError(f"{name}: {'the point' if len(values) == 1 else 'the bounds'} must be finite")
+        return float(method(f, *values))
+
+    def tool(env):
+        values = [bound(env) for bound in bounds]
+        arrays = {key: value for key, value in env.items() if getattr(value, "ndim", 0)}
+        if arrays or any(getattr(value, "ndim", 0) for value in values):
+            # A table or plot over x passes arrays: run once per point
+            import numpy as np
+            keys = list(arrays)
+
+            def point(*args):
+                return run(ChainMap(dict(zip(keys, args)), env), args[len(keys):])
+            return np.vectorize(point, otypes=[float])(*arrays.values(), *values)
+        return inexact(run(env, values))
+    return tool
+
+# Worksheet
+STATEMENT_RE = re.compile(r"\s*(?P<name>[A-Za-z_]\w*)\s*(?:\((?P<params>[^()]*)\))?\s*=(?P<body>.*)\Z", re.S)
+ANS_RE = re.compile(r"\bans\b")
+MEMORY = "M"
+
+class Cell:
+    """A named worksheet definition: a variable, or a function when params is not None."""
+    __slots__ = ("name", "text", "params", "references", "compiled", "value", "error")
+
+    def __init__(self, name, text, params=None):
+        self.name = name
+        self.text = text
+        self.params = params
+        self.references = frozenset()  # names of the cells the formula uses
+        self.compiled = None
+        self.value = None
+        self.error = None
+
+    def label(self):
+        return self.name if self.params is None else f"{self.name}({', '.join(self.params)})"
+
+class Worksheet:
+    """Variables and user functions defined by statements, kept up to date through a dependency graph.
+
+    Statements are "name = formula", "f(x, y) = formula" or a plain
+    expression, whose value becomes ans. Each cell records the names its
+    formula uses; redefining a cell recomputes just the cells that depend
+    on it, directly or not, each once and after everything it uses.
+    Circular definitions are rejected, so the graph stays acyclic.
+    """
+    def __init__(self, mode="float", digits=None):
+        self.numbers = number_system(mode, digits)
+        self.mode = mode
+        self.digits = digits
+        self.cells = {}
+        self.dependents = {}  # name -> names of the cells whose formula uses it
+        self.env = {}  # what formulas see: variable values and function callables
+        self.ans = None
+        self.version = 0  # bumped on every change, for caches of values that read env
+        self.deadline = None  # time.monotonic() after which calls to user functions fail, see PreviewEvaluator
+        self.listeners = []  # called with the names recomputed by each change
+        self.define(MEMORY, "0")
+
+    def function_names(self):
+        return {name for name, cell in self.cells.items() if cell.params is not None}
+
+    def substitute_ans(self, text):
+        """Replace ans by the last result, so formulas keep the value it had when they were entered."""
+        if self.ans is None:
+            return text
+        return ANS_RE.sub(f"({format_result(self.ans)})", text)
+
+    def parse_statement(self, text):
+        """Split a statement into (name, formula, params); name is None for a plain expression, params for a variable."""
+        text = self.substitute_ans(text)
+        match = STATEMENT_RE.match(text)
+        if match is None:
+            return None, text, None
+        params = match["params"]
+        if params is not None:
+            params = tuple(param.strip() for param in params.split(","))
+        return match["name"], match["body"].strip(), params
+
+    def run(self, text, known=None):
+        """Run a statement. Returns (name, value): name is None for a plain expression, value is None for a function.
+
+        known, what execute() returned for the same statement on a copy of
+        this worksheet, supplies the values instead of computing them again.
+        """
+        name, formula, params = self.parse_statement(text)
+        if name is None:
+            value = self.evaluate(formula) if known is None else known["ans"][0]
+            self.ans = value
+            return None, value
+        cell = self.define(name, formula, params, known)
+        if cell.error:
+            raise ExpressionError(cell.error)
+        if cell.params is None:
+            self.ans = cell.value
+        return cell.name, cell.value
+
+    def execute(self, text):
+        """Run a statement and return what it produced, for run(text, known) on another copy of the worksheet.
+
+        The result maps each cell recomputed to its (value, error), or
+        "ans" to the value of a plain expression. Unlike run(), a definition
+        whose value fails is not an exception here; it is part of the result.
+        ans is updated as run() would, so later statements see it.
+        """
+        name, formula, params = self.parse_statement(text)
+        if name is None:
+            self.ans = self.evaluate(formula)
+            return {"ans": (self.ans, None)}
+        cell = self.define(name, formula, params)
+        if cell.params is None and not cell.error:
+            self.ans = cell.value
+        return self.results(self.downstream(name))
+
+    def results(self, names):
+        """The (value, error) of the named cells, as run(), set_value() and set_mode() take them in known."""
+        return {name: (self.cells[name].value, self.cells[name].error) for name in names}
+
+    def evaluate(self, text):
+        """The value of an expression over the worksheet's variables and functions."""
+        tree = Parser(text, self.numbers, user_functions=self.function_names()).parse()
+        for name in free_names(tree) | called_functions(tree):
+            cell = self.cells.get(name)
+            if cell is not None and cell.error:
+                raise ExpressionError(f"{name} has an error: {cell.error}")
+            if cell is not None and cell.params is not None and name not in called_functions(tree):
+                raise ExpressionError(f"{name} is a function; call it as {cell.label()}")
+        function = compile_node(tree, self.numbers)
+        if self.numbers.finish is not None:
+            function = finishing(function, self.numbers.finish)
+        return function(self.env)
+
+    def define(self, name, text, params=None, known=None):
+        """Add or replace a cell, then recompute it and everything depending on it. Returns the cell.
+
+        known maps cell names to an already computed (value, error), see recompute().
+        """
+        if name in self.numbers.functions or name in self.numbers.constants or name in NUMERIC_TOOLS or name == "ans":
+            raise ExpressionError(f"{name!r} is a built-in name")
+        if params is not None:
+            for param in params:
+                if not re.fullmatch(r"[A-Za-z_]\w*", param) or param in self.numbers.functions:
+                    raise ExpressionError(f"Invalid parameter name {param!r}")
+            if len(set(params)) != len(params):
+                raise ExpressionError("Parameter names must be different")
+        old = self.cells.get(name)
+        if old is not None and (old.params is None) != (params is None) and self.dependents.get(name):
+            raise ExpressionError(f"{name!r} is used as a {'function' if params is None else 'variable'}")
+        cell = Cell(name, text, params)
+        self.build(cell)
+        # Rejecting cycles here keeps every later recompute finite
+        if name in cell.references or name in self.upstream(cell.references):
+            raise ExpressionError(f"Circular definition: {name} depends on itself")
+        if old is not None:
+            for reference in old.references:
+                self.dependents[reference].discard(name)
+        for reference in cell.references:
+            self.dependents.setdefault(reference, set()).add(name)
+        self.cells[name] = cell
+        self.recompute(self.downstream(name), known)
+        return cell
+
+    def set_value(self, name, value, known=None):
+        """Define a variable holding a plain value, e.g. the memory register."""
+        return self.define(name, format_result(value), known=known)
+
+    def assign(self, name, expression):
+        """Set a variable to the present value of an expression, which may use the variable itself, as in M + 2."""
+        return self.set_value(name, self.evaluate(self.substitute_ans(expression)))
+
+    def remove(self, name):
+        """Delete a cell that nothing else uses."""
+        if name == MEMORY:
+            raise ExpressionError(f"{MEMORY} is the memory register; clear it with MC")
+        users = self.dependents.get(name)
+        if users:
+            raise ExpressionError(f"{name} is used by {', '.join(sorted(users))}")
+        cell = self.cells.pop(name)
+        for reference in cell.references:
+            self.dependents[reference].discard(name)
+        self.dependents.pop(name, None)
+        self.env.pop(name, None)
+        self.changed([name])
+
+    def set_mode(self, mode, digits=None, known=None):
+        """Switch precision mode and recompute every cell, since literals read differently in each mode."""
+        numbers = number_system(mode, digits)
+        self.mode, self.digits = mode, digits
+        if numbers is self.numbers:
+            return
+        self.numbers = numbers
+        order = self.ordered()
+        for name in order:
+            self.build(self.cells[name])
+        self.recompute(order, known)
+
+    def ordered(self):
+        """Every cell name, each after the cells it uses."""
+        return self.downstream(*(name for name, cell in self.cells.items() if not cell.references))
+
+    def definitions(self):
+        """Every cell as (name, formula, params, value, error) in dependency order, for restore()."""
+        return [(name, self.cells[name].text, self.cells[name].params, self.cells[name].value, self.cells[name].error)
+                for name in self.ordered()]
+
+    @classmethod
+    def restore(cls, mode, digits, definitions, ans=None):
+        """A worksheet rebuilt from another's definitions() and ans, taking their values rather than recomputing them."""
+        worksheet = cls(mode, digits)
+        for name, text, params, value, error in definitions:
+            worksheet.define(name, text, params, {name: (value, error)})
+        worksheet.ans = ans
+        return worksheet
+
+    def build(self, cell):
+        """Parse and compile a cell's formula and record what it uses."""
+        tree = Parser(cell.text, self.numbers, user_functions=self.function_names()).parse()
+        variables = free_names(tree) - set(cell.params or ())
+        functions = called_functions(tree) - set(self.numbers.functions)
+        for reference in variables:
+            if reference not in self.cells or self.cells[reference].params is not None:
+                raise ExpressionError(f"Unknown variable {reference!r}")
+        cell.references = frozenset(variables | functions)
+        cell.compiled = compile_node(tree, self.numbers)
+        # A variable's value is final, so it is normalized like any result; a function's is not
+        if cell.params is None and self.numbers.finish is not None:
+            cell.compiled = finishing(cell.compiled, self.numbers.finish)
+
+    def upstream(self, names):
+        """Every cell that names use, directly or indirectly."""
+        seen = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self.cells[name].references)
+        return seen
+
+    def downstream(self, *names):
+        """names and every cell depending on them, ordered so each comes after everything it uses."""
+        # Reverse post-order of a depth-first walk along dependents is a topological order
+        order = []
+        seen = set(names)
+        for root in names:
+            stack = [(root, iter(sorted(self.dependents.get(root, ()))))]
+            while stack:
+                name, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    order.append(name)
+                elif child not in seen:
+                    seen.add(child)
+                    stack.append((child, iter(sorted(self.dependents.get(child, ())))))
+        return order[::-1]
+
+    def recompute(self, order, known=None):
+        """Evaluate the cells in order; a cell using one that failed fails too.
+
+        A variable named in known takes its (value, error) from there instead of being evaluated.
+        """
+        for name in order:
+            cell = self.cells[name]
+            failed = sorted(reference for reference in cell.references if self.cells[reference].error)
+            cell.value = cell.error = None
+            if failed:
+                cell.error = f"uses {', '.join(failed)}, which has an error"
+                self.env.pop(name, None)
+            elif cell.params is not None:
+                self.env[name] = self.make_function(cell)
+            else:
+                if known is not None and name in known:
+                    cell.value, cell.error = known[name]
+                else:
+                    try:
+                        cell.value = cell.compiled(self.env)
+                    except ZeroDivisionError:
+                        cell.error = "division by zero"
+                    except Exception as e:
+                        cell.error = str(e)
+                if cell.error:
+                    self.env.pop(name, None)
+                else:
+                    self.env[name] = cell.value
+        self.changed(order)
+
+    def make_function(self, cell):
+        """A callable evaluating a function cell with its parameters bound over the worksheet's values."""
+        name, params, compiled, env = cell.name, cell.params, cell.compiled, self.env
+        worksheet = self
+
+        def function(*args):
+            # Nested calls are the one way to make a short formula run for hours
+            if worksheet.deadline is not None and time.monotonic() > worksheet.deadline:
+                raise TimeoutError("Out of time")
+            if len(args) != len(params):
+                raise ExpressionError(f"{name}() takes {len(params)} argument(s) but {len(args)} were given")
+            return compiled(ChainMap(dict(zip(params, args)), env))
+        return function
+
+    def changed(self, names):
+        self.version += 1
+        for listener in self.listeners:
+            listener(names)
+
+# Live preview
+PREVIEW_DELAY_MS = 150
+PREVIEW_BUDGET = 0.2  # seconds a preview may spend in worksheet functions before giving up
+MISSING = object()
+
+class PreviewEvaluator:
+    """Evaluates successive edits of one expression, reusing the values of unchanged subtrees.
+
+    Trees are parsed without constant folding, which would recompute
+    everything on every keystroke. AST nodes are tuples that compare by
+    structure, so a subtree the edit did not touch is equal to one from the
+    previous parse and its value is looked up rather than recomputed.
+    Typing at the end of a long expression therefore only evaluates the
+    nodes along its right edge.
+    """
+    def __init__(self):
+        self.numbers = None
+        self.worksheet = None
+        self.version = None
+        self.env = {}
+        self.values = {}
+        self.previous = {}
+        self.computed = 0  # nodes evaluated by the last preview, for checking reuse
+
+    def preview(self, text, mode="float", digits=None, worksheet=None, budget=PREVIEW_BUDGET):
+        """The value of text, or None if it is incomplete, invalid or too costly to preview.
+
+        With a worksheet, text may use its variables, functions and ans, and
+        an assignment previews the value being assigned. Nothing costly runs
+        here, on the Tk thread: huge powers and numeric tools, which sample
+        their body thousands of times, are not previewed, and calls to
+        worksheet functions fail once budget seconds have passed.
+        """
+        numbers = number_system(mode, digits)
+        version = worksheet.version if worksheet is not None else None
+        # Values of names are only valid for the worksheet state they were computed in
+        if numbers is not self.numbers or worksheet is not self.worksheet or version != self.version:
+            self.numbers, self.worksheet, self.version = numbers, worksheet, version
+            self.values = {}
+        if worksheet is not None:
+            self.env = worksheet.env
+            text = worksheet.substitute_ans(text)
+            match = STATEMENT_RE.match(text)
+            if match is not None:
+                if match["params"] is not None:
+                    return None
+                text = match["body"]
+        try:
+            tree = self.parse(text.strip())
+        except ExpressionError:
+            return None
+        self.previous, self.values = self.values, {}
+        self.computed = 0
+        if worksheet is not None:
+            worksheet.deadline = time.monotonic() + budget
+        try:
+            value = self.value(tree)
+            return value if numbers.finish is None else numbers.finish(value)
+        except Exception:
+            return None
+        finally:
+            if worksheet is not None:
+                worksheet.deadline = None
+
+    def parse(self, text):
+        """Parse text, closing any parentheses still open so "sqrt(2" previews as sqrt(2)."""
+        user_functions = self.worksheet.function_names() if self.worksheet is not None else ()
+        try:
+            return Parser(text, self.numbers, folding=False, user_functions=user_functions).parse()
+        except ExpressionError:
+            unclosed = text.count("(") - text.count(")")
+            if unclosed <= 0:
+                raise
+            return Parser(text + ")" * unclosed, self.numbers, folding=False, user_functions=user_functions).parse()
+
+    def value(self, node):
+        kind = node[0]
+        if kind == "num":
+            return node[1]
+        value = self.values.get(node, MISSING)
+        if value is MISSING:
+            value = self.previous.get(node, MISSING)
+            if value is MISSING:
+                value = self.compute(node)
+            self.values[node] = value
+        return value
+
+    def compute(self, node):
+        self.computed += 1
+        operations = self.numbers.operations
+        kind = node[0]
+        if kind == "name":
+            value = self.env.get(node[1], MISSING)
+            if value is MISSING or callable(value):
+                raise ExpressionError(f"Unknown variable {node[1]!r}")
+            return value
+        if kind == "neg":
+            return operations["neg"](self.value(node[1]))
+        if kind == "bin":
+            left, right = self.value(node[2]), self.value(node[3])
+            if node[1] == "**" and is_huge_power(left, right):
+                raise OverflowError("Power too large to preview")
+            return operations[node[1]](left, right)
+        if kind == "tool":
+            raise OverflowError("Numeric tools are not previewed")
+        function = self.numbers.functions.get(node[1]) or self.env[node[1]]
+        return function(*(self.value(arg) for arg in node[2]))
+
+# Table and plot mode
+MAX_POINTS = 5_000_000
+TABLE_ROWS = 101
+
+def evaluate_range(text, start, stop, points, variable="x"):
+    """Evaluate an expression at points evenly spaced values of variable, in one NumPy pass.
+
+    Returns (xs, ys) float arrays. Values outside a function's domain come
+    back as nan or inf rather than raising.
+    """
+    import numpy as np
+    if not 2 <= points <= MAX_POINTS:
+        raise ValueError(f"Points must be between 2 and {MAX_POINTS:,}")
+    compiled = compile_expression(text.strip())
+    unknown = compiled.names - {variable}
+    if unknown:
+        raise ExpressionError(f"Unknown variable {min(unknown)!r}; the table is over {variable!r}")
+    xs = np.linspace(start, stop, points)
+    with np.errstate(all="ignore"):
+        ys = compiled.vectorized()({variable: xs})
+    # A constant expression comes back as a scalar
+    return xs, np.broadcast_to(np.asarray(ys, dtype=float), xs.shape)
+
+def downsample(xs, ys, buckets):
+    """Reduce a curve to the lowest and highest point of each of buckets x-slices.
+
+    Plotting the result looks the same as plotting every point, spikes
+    included, at a cost set by the plot width rather than the point count.
+    """
+    import numpy as np
+    if len(xs) <= 2 * buckets:
+        return xs, ys
+    usable = len(xs) // buckets * buckets
+    x = xs[:usable].reshape(buckets, -1)
+    y = ys[:usable].reshape(buckets, -1)
+    finite = np.isfinite(y)
+    low = np.where(finite, y, np.inf).argmin(axis=1)
+    high = np.where(finite, y, -np.inf).argmax(axis=1)
+    rows = np.arange(buckets)[:, None]
+    picks = np.sort(np.stack([low, high], axis=1), axis=1)  # keep each pair in x order
+    return x[rows, picks].ravel(), y[rows, picks].ravel()
+
+class PlotWindow:
+    """Window that tabulates and plots an expression in x over a range."""
+    PLOT_WIDTH = 460
+    PLOT_HEIGHT = 260
+
+    def __init__(self, root, expression="", colors=None):
+        self.window = ttkb.Toplevel(root)
+        self.window.title("Table and Plot")
+        self.window.geometry("500x640")
+        self.colors = colors or {"bg": "#FFFFFF", "text": "#000000"}
+
+        form = ttkb.Frame(self.window, padding=10)
+        form.pack(fill=X)
+        self.expression_var = tk.StringVar(value=expression or "sin(x)")
+        self.start_var = tk.StringVar(value="0")
+        self.stop_var = tk.StringVar(value="360")
+        self.points_var = tk.StringVar(value="1000")
+        for row, (label, var) in enumerate((("f(x) =", self.expression_var), ("From", self.start_var),
+                                            ("To", self.stop_var), ("Points", self.points_var))):
+            ttkb.Label(form, text=label).grid(row=row, column=0, sticky="w", pady=2)
+            entry = ttkb.Entry(form, textvariable=var)
+            entry.grid(row=row, column=1, sticky="ew", pady=2)
+            entry.bind("<Return>", lambda event: self.evaluate())
+        form.grid_columnconfigure(1, weight=1)
+        ttkb.Button(form, text="Evaluate", command=self.evaluate, bootstyle="success").grid(
+            row=4, column=0, columnspan=2, sticky="ew", pady=5)
+        self.status_var = tk.StringVar()
+        ttkb.Label(form, textvariable=self.status_var).grid(row=5, column=0, columnspan=2, sticky="w")
+
+        self.canvas = tk.Canvas(self.window, width=self.PLOT_WIDTH, height=self.PLOT_HEIGHT,
+                                bg=self.colors["bg"], highlightthickness=0)
+        self.canvas.pack(padx=10)
+
+        table_frame = ttkb.Frame(self.window, padding=10)
+        table_frame.pack(fill=BOTH, expand=True)
+        self.table = ttkb.Treeview(table_frame, columns=("x", "y"), show="headings", height=8)
+        self.table.heading("x", text="x")
+        self.table.heading("y", text="f(x)")
+        scrollbar = ttkb.Scrollbar(table_frame, orient=VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.table.pack(side=LEFT, fill=BOTH, expand=True)
+        self.evaluate()
+
+    def evaluate(self):
+        """Evaluate over the range, then redraw the table and plot."""
+        import numpy as np
+        try:
+            points = int(self.points_var.get())
+            xs, ys = evaluate_range(self.expression_var.get(), float(self.start_var.get()),
+                                    float(self.stop_var.get()), points)
+        except Exception as e:
+            self.status_var.set(f"Error: {e}")
+            return
+        finite = np.isfinite(ys)
+        self.status_var.set(f"{points:,} points, {points - int(finite.sum()):,} undefined")
+        self.show_table(xs, ys)
+        self.plot(xs, ys, finite)
+
+    def show_table(self, xs, ys):
+        """List TABLE_ROWS evenly spaced samples, including both ends."""
+        import numpy as np
+        self.table.delete(*self.table.get_children())
+        for i in np.linspace(0, len(xs) - 1, min(len(xs), TABLE_ROWS)).astype(int):
+            self.table.insert("", END, values=(f"{xs[i]:.10g}", f"{ys[i]:.10g}"))
+
+    def plot(self, xs, ys, finite):
+        """Draw the downsampled curve, breaking it wherever it is undefined."""
+        import numpy as np
+        self.canvas.delete("all")
+        if not finite.any():
+            return
+        low, high = ys[finite].min(), ys[finite].max()
+        # Near-vertical asymptotes like tan(90) would flatten everything else, so scale to the bulk of the values
+        p1, p99 = np.percentile(ys[finite], [1, 99])
+        if high - low > 10 * (p99 - p1) > 0:
+            low, high = p1, p99
+        if high == low:
+            low, high = low - 1, high + 1
+        xs, ys = downsample(xs, ys, self.PLOT_WIDTH)
+        width, height, margin = self.PLOT_WIDTH, self.PLOT_HEIGHT, 10
+        px = margin + (xs - xs[0]) / ((xs[-1] - xs[0]) or 1) * (width - 2 * margin)
+        py = height - margin - (np.clip(ys, low, high) - low) / (high - low) * (height - 2 * margin)
+        if low < 0 < high:
+            zero = height - margin - (0 - low) / (high - low) * (height - 2 * margin)
+            self.canvas.create_line(margin, zero, width - margin, zero, fill="#A0AEC0")
+        self.canvas.create_text(margin, margin, text=f"{high:.4g}", anchor="nw", fill=self.colors["text"])
+        self.canvas.create_text(margin, height - margin, text=f"{low:.4g}", anchor="sw", fill=self.colors["text"])
+        # One polyline per run of defined points
+        breaks = np.flatnonzero(~np.isfinite(ys))
+        for run_x, run_y in zip(np.split(px, breaks), np.split(py, breaks)):
+            keep = np.isfinite(run_y)
+            if keep.sum() >= 2:
+                self.canvas.create_line(*np.column_stack([run_x[keep], run_y[keep]]).ravel().tolist(),
+                                        fill="#4FD1C5", width=2)
+
+# History
+HISTORY_FILE = "calculator_history.jsonl"
+HISTORY_RING_SIZE = 1000
+HISTORY_ROW_HEIGHT = 20
+HISTORY_SEARCH_DELAY_MS = 200
+
+class HistoryEntry:
+    """One calculation: when it happened, what was typed, what came out and in which precision mode."""
+    __slots__ = ("timestamp", "expression", "result", "mode")
+
+    def __init__(self, timestamp, expression, result, mode="float"):
+        self.timestamp = timestamp
+        self.expression = expression
+        self.result = result
+        self.mode = mode
+
+    def to_json(self):
+        return json.dumps({"timestamp": self.timestamp, "expression": self.expression,
+                           "result": self.result, "mode": self.mode})
+
+    @classmethod
+    def from_json(cls, line):
+        try:
+            record = json.loads(line)
+            return cls(record["timestamp"], record["expression"], record["result"], record.get("mode", "float"))
+        except (ValueError, KeyError, TypeError):
+            return cls("", "(unreadable entry)", "")
+
+    def matches(self, needle):
+        """Whether the lowercase needle occurs in the expression or result."""
+        return needle in self.expression.lower() or needle in self.result.lower()
+
+    def __str__(self):
+        mode = f"  [{self.mode}]" if self.mode != "float" else ""
+        return f"{self.timestamp}: {self.expression} = {self.result}{mode}"
+
+class HistoryStore:
+    """Calculator history in an append-only JSON Lines file.
+
+    Only the byte offset of each line and the latest ring_size entries are
+    kept in memory; older entries are read back from the file by offset
+    when they are scrolled into view.
+    """
+    def __init__(self, path=HISTORY_FILE, ring_size=HISTORY_RING_SIZE):
+        self.path = path
+        self.offsets = array("q")
+        self.recent = deque(maxlen=ring_size)
+        self.size = 0  # bytes of complete lines in the file
+        self.load()
+
+    def load(self):
+        """Index the lines of the file and keep the latest entries."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash; appending resumes over it
+                self.offsets.append(self.size)
+                self.size += len(line)
+        # Parsing only the tail keeps startup cheap however long the history is
+        self.recent.extend(self.read(range(max(0, len(self) - self.recent.maxlen), len(self))))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, entry):
+        """Add an entry at the end of the file."""
+        line = (entry.to_json() + "\n").encode("utf-8")
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f:
+            f.seek(self.size)
+            f.write(line)
+            f.truncate()
+        self.offsets.append(self.size)
+        self.size += len(line)
+        self.recent.append(entry)
+
+    def get_many(self, indices):
+        """The entries at indices, from memory where possible and otherwise with one pass over the file."""
+        first_recent = len(self) - len(self.recent)
+        older = [i for i in indices if i < first_recent]
+        found = dict(zip(older, self.read(older))) if older else {}
+        return [found[i] if i < first_recent else self.recent[i - first_recent] for i in indices]
+
+    def read(self, indices):
+        """Read the entries at indices from the file."""
+        entries = []
+        with open(self.path, "rb") as f:
+            for i in indices:
+                f.seek(self.offsets[i])
+                entries.append(HistoryEntry.from_json(f.readline()))
+        return entries
+
+    def search(self, text):
+        """Indices of the entries whose expression or result contains text, ignoring case."""
+        needle = text.lower()
+        encoded = needle.encode("utf-8")
+        matches = []
+        if not self.offsets:
+            return matches
+        with open(self.path, "rb") as f:
+            for index, line in enumerate(f):
+                if index == len(self):
+                    break
+                # Cheap byte test first; only candidate lines are decoded, and keys such as "mode" are weeded out
+                if encoded in line.lower() and HistoryEntry.from_json(line).matches(needle):
+                    matches.append(index)
+        return matches
+
+    def clear(self):
+        """Delete every entry."""
+        with open(self.path, "wb"):
+            pass
+        self.offsets = array("q")
+        self.recent.clear()
+        self.size = 0
+
+class HistoryPanel:
+    """Scrollable, searchable list of every history entry, newest first.
+
+    Only the rows in view are drawn, onto a plain canvas, so scrolling and
+    redrawing cost the same for ten entries or a hundred thousand.
+    Clicking a row passes its entry to on_select.
+    """
+    def __init__(self, parent, store, on_select, colors):
+        self.store = store
+        self.on_select = on_select
+        self.colors = colors
+        self.rows = range(0)  # store indices in display order
+        self.top = 0
+        self.search_job = None
+
+        self.search_var = tk.StringVar()
+        self.search_entry = ttkb.Entry(parent, textvariable=self.search_var)
+        self.search_entry.pack(fill=X, pady=(0, 5))
+        # Keep the calculator's window-wide key bindings out of the search box
+        self.search_entry.bindtags(tuple(tag for tag in self.search_entry.bindtags() if tag != str(parent.winfo_toplevel())))
+        self.search_var.trace_add("write", self.schedule_search)
+
+        self.canvas = tk.Canvas(parent, height=100, highlightthickness=0)
+        self.scrollbar = ttkb.Scrollbar(parent, orient=VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.canvas.pack(side=LEFT, fill=BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda event: self.scroll_to(self.top))
+        self.canvas.bind("<Button-1>", self.click)
+        self.canvas.bind("<MouseWheel>", lambda event: self.yview("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+        self.refresh()
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // HISTORY_ROW_HEIGHT)
+
+    def refresh(self):
+        """Re-read the row list after the store changed, keeping the search and scroll position."""
+        if self.search_var.get().strip():
+            self.rows = self.store.search(self.search_var.get().strip())[::-1]
+        else:
+            self.rows = range(len(self.store) - 1, -1, -1)
+        self.scroll_to(self.top)
+
+    def schedule_search(self, *args):
+        if self.search_job is not None:
+            self.canvas.after_cancel(self.search_job)
+        self.search_job = self.canvas.after(HISTORY_SEARCH_DELAY_MS, self.search)
+
+    def search(self):
+        self.search_job = None
+        self.top = 0
+        self.refresh()
+
+    def yview(self, action, amount, unit=None):
+        """Scrollbar and mouse wheel callback, with the same arguments as Canvas.yview."""
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self.rows)))
+        else:
+            step = self.visible_rows() if unit == "pages" else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, len(self.rows) - self.visible_rows()))
+        self.redraw()
+
+    def redraw(self):
+        """Draw the rows in view and update the scrollbar."""
+        self.canvas.delete("all")
+        self.canvas.configure(bg=self.colors["bg"])
+        shown = self.rows[self.top:self.top + self.visible_rows()]
+        for row, entry in enumerate(self.store.get_many(shown)):
+            self.canvas.create_text(5, row * HISTORY_ROW_HEIGHT + 2, text=str(entry), anchor="nw",
+                                    font=("Helvetica", 10), fill=self.colors["text"])
+        if self.rows:
+            self.scrollbar.set(self.top / len(self.rows), (self.top + len(shown)) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def click(self, event):
+        row = self.top + event.y // HISTORY_ROW_HEIGHT
+        if row < len(self.rows):
+            self.on_select(self.store.get_many([self.rows[row]])[0])
+
+    def set_colors(self, colors):
+        self.colors = colors
+        self.redraw()
+
+# Batch mode
+BATCH_CHUNK_SIZE = 2000
+
+def evaluate_line(line, mode="float", digits=None):
+    """The output line for one input line: the result as the display would show it, or "error: ...".
+
+    Blank lines stay blank so output lines up with input.
+    """
+    expression = line.strip()
+    if not expression:
+        return ""
+    try:
+        return format_result(evaluate(expression, mode=mode, digits=digits))
+    except ZeroDivisionError:
+        return "error: division by zero"
+    except Exception as e:
+        return f"error: {e}"
+
+def evaluate_chunk(job):
+    """Pool worker: evaluate a (lines, mode, digits) job into a list of output lines."""
+    lines, mode, digits = job
+    return [evaluate_line(line, mode, digits) for line in lines]
+
+def batch_evaluate(lines, mode="float", digits=None, workers=None, chunk_size=BATCH_CHUNK_SIZE):
+    """Evaluate an iterable of expressions, yielding one output line per input in input order.
+
+    Chunks of lines go to a process pool. At most a few chunks per worker
+    are in flight, so input is read only as fast as it is evaluated and an
+    endless stream runs in constant memory.
+    """
+    number_system(mode, digits)  # reject a bad mode or digit count before starting any workers
+    workers = workers or os.cpu_count() or 1
+    lines = iter(lines)
+    jobs = iter(lambda: list(islice(lines, chunk_size)), [])
+    if workers == 1:
+        for chunk in jobs:
+            yield from evaluate_chunk((chunk, mode, digits))
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in jobs:
+            pending.append(pool.apply_async(evaluate_chunk, ((chunk, mode, digits),)))
+            if len(pending) >= 4 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+def run_batch(source, mode="float", digits=None, workers=None, output=sys.stdout):
+    """Evaluate every line of a file ("-" for stdin) to output; returns the number of lines that failed."""
+    errors = 0
+    # Only a file opened here is closed here; stdin stays open for the caller
+    with (open(source) if source != "-" else nullcontext(sys.stdin)) as lines:
+        for result in batch_evaluate(lines, mode, digits, workers):
+            errors += result.startswith("error: ")
+            output.write(result + "\n")
+    return errors
+
+# Sandboxed evaluation
+EVALUATION_TIMEOUT = 10  # seconds
+EVALUATION_MEMORY_MB = 512
+EVALUATION_POLL_MS = 50
+
+class EvaluationCancelled(Exception):
+    """Passed to an EvaluationWorker callback whose statement was cancelled."""
+
+def limit_memory(megabytes):
+    """Cap this process's address space at its present size plus megabytes. Returns whether the OS allowed it."""
+    try:
+        import resource
+        with open("/proc/self/statm") as statm:
+            size = int(statm.read().split()[0]) * resource.getpagesize()
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = size + megabytes * 2**20
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ImportError, OSError, ValueError):
+        return False  # no resource module on Windows, no /proc on macOS: only the timeout applies
+    return True
+
+def evaluation_worker(connection, memory_mb):
+    """Worker process: run each (job id, kind, payload, copy) job and send back the result.
+
+    kind is "run" for a statement, "assign" for a (name, expression) pair
+    or "mode" for a (mode, digits) pair; see EvaluationWorker. copy, when
+    sent, is the arguments of Worksheet.restore() and replaces the worker's
+    copy of the worksheet. The copy is kept between jobs, so statements see
+    the definitions and ans of the ones before them.
+    """
+    # BLAS threads reserve memory against the cap and only element-wise NumPy is used here
+    os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    limit_memory(memory_mb)
+    worksheet = None
+    while True:
+        try:
+            job_id, kind, payload, copy = connection.recv()
+        except EOFError:
+            return
+        try:
+            if copy is not None:
+                worksheet = None
+                worksheet = Worksheet.restore(*copy)
+            if kind == "run":
+                result = worksheet.execute(payload)
+            elif kind == "assign":
+                result = worksheet.results(worksheet.downstream(worksheet.assign(*payload).name))
+            else:
+                worksheet.set_mode(*payload)
+                result = worksheet.results(worksheet.ordered())
+            connection.send((job_id, result, None))
+        except MemoryError:
+            connection.send((job_id, None, MemoryError(f"Not enough memory: the limit is {memory_mb} MB")))
+        except Exception as e:
+            connection.send((job_id, None, e))
+
+class EvaluationWorker:
+    """Runs worksheet statements, assignments and mode switches in a separate, reusable process.
+
+    Anything that evaluates formulas goes through here, so a slow one
+    cannot freeze the window.
+
+    The process keeps a copy of the worksheet, sent again only after the
+    worksheet or its ans changed other than through the worker. ans is
+    resolved in the copy when a statement runs, so a statement queued
+    behind another sees that one's result. Results come back as
+    the values the statement computed and are applied to the worksheet
+    with run(text, known), so nothing is evaluated twice. A statement still
+    running after timeout seconds is stopped by killing the process, and
+    the statements queued behind it are sent again to a fresh process.
+    Cancelling stops every pending statement. Where the OS allows it the
+    process's memory is capped at memory_mb as well.
+
+    Call poll() regularly, e.g. from Tk's after(), to deliver results.
+    """
+    def __init__(self, worksheet, timeout=EVALUATION_TIMEOUT, memory_mb=EVALUATION_MEMORY_MB):
+        self.worksheet = worksheet
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.process = None
+        self.connection = None
+        self.synced = None  # the state() the worker's copy matches once it has run all jobs
+        self.jobs = deque()  # (job id, kind, payload, state() when sent, callback)
+        self.last_id = 0
+        self.deadline = None  # when the oldest pending job times out
+
+    def submit(self, statement, callback):
+        """Queue a statement; callback(result, error) later gets what run() returns, or the exception."""
+        self.send("run", statement, callback)
+
+    def assign(self, name, expression, callback):
+        """Queue Worksheet.assign(); callback(result, error) later gets the variable's cell, or the exception."""
+        self.send("assign", (name, expression), callback)
+
+    def set_mode(self, mode, digits, callback):
+        """Queue a switch of the worksheet's precision mode; callback(result, error) gets None or the exception."""
+        self.send("mode", (mode, digits), callback)
+
+    def send(self, kind, payload, callback):
+        if self.process is None:
+            parent, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target=evaluation_worker, args=(child, self.memory_mb), daemon=True)
+            self.process.start()
+            child.close()
+            self.connection = parent
+        worksheet = self.worksheet
+        state = self.state()
+        copy = None
+        if not self.same(self.synced, state):
+            copy = (worksheet.mode, worksheet.digits, worksheet.definitions(), worksheet.ans)
+        self.last_id += 1
+        self.connection.send((self.last_id, kind, payload, copy))
+        self.synced = state
+        if not self.jobs:
+            self.deadline = time.monotonic() + self.timeout
+        self.jobs.append((self.last_id, kind, payload, state, callback))
+
+    def state(self):
+        return self.worksheet.version, self.worksheet.ans
+
+    @staticmethod
+    def same(state, other):
+        # ans is compared by identity: equal values such as 1 and Decimal("1.0") substitute differently
+        return state is not None and other is not None and state[0] == other[0] and state[1] is other[1]
+
+    def busy(self):
+        return bool(self.jobs)
+
+    def poll(self):
+        """Deliver the results that are ready and enforce the timeout. Returns whether jobs are still pending."""
+        while self.jobs:
+            try:
+                ready = self.connection.poll()
+                reply = self.connection.recv() if ready else None
+            except (EOFError, OSError):
+                self.restart(RuntimeError("The evaluation process stopped unexpectedly"))
+                continue
+            if reply is None:
+                if time.monotonic() > self.deadline:
+                    self.restart(TimeoutError(f"Evaluation took longer than {self.timeout:g} s and was stopped"))
+                break
+            job_id, known, error = reply
+            _, kind, payload, sent, callback = self.jobs.popleft()
+            self.deadline = time.monotonic() + self.timeout
+            result = None
+            if error is None:
+                unchanged = self.same(self.state(), sent)
+                try:
+                    if kind == "run":
+                        # ans is resolved now, to the value the worker's copy had when it ran the statement
+                        result = self.worksheet.run(payload, known)
+                    elif kind == "assign":
+                        result = self.worksheet.set_value(payload[0], known[payload[0]][0], known)
+                    else:
+                        self.worksheet.set_mode(*payload, known=known)
+                except Exception as e:
+                    error = e
+                # Only if nothing else changed the worksheet meanwhile does the worker's copy still match it
+                self.synced = self.state() if unchanged else None
+            else:
+                self.synced = None
+            callback(result, error)
+        return bool(self.jobs)
+
+    def cancel(self):
+        """Stop every pending statement; their callbacks get EvaluationCancelled."""
+        self.fail(EvaluationCancelled("Cancelled"))
+
+    def restart(self, error):
+        """Kill the process, fail the job it was running with error and send the ones behind it to a new one."""
+        self.stop()
+        jobs, self.jobs = self.jobs, deque()
+        _, _, _, _, callback = jobs.popleft()
+        # The worksheet is as the failed job found it, so the fresh copy is what the queued jobs expect
+        for _, kind, payload, _, queued in jobs:
+            self.send(kind, payload, queued)
+        callback(None, error)
+
+    def fail(self, error):
+        """Kill the process and fail every pending job with error."""
+        self.stop()
+        jobs, self.jobs = self.jobs, deque()
+        for _, _, _, _, callback in jobs:
+            callback(None, error)
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+        self.process = self.connection = None
+        self.synced = None
+
+class WorksheetWindow:
+    """Window listing a worksheet's variables and functions, with an entry for new statements.
+
+    Rows are updated from the worksheet's change notifications, so only the
+    cells a statement recomputed are redrawn. Statements are evaluated by
+    submit(statement, callback), which runs them off the Tk thread.
+    """
+    def __init__(self, root, worksheet, submit):
+        self.worksheet = worksheet
+        self.submit = submit
+        self.window = ttkb.Toplevel(root)
+        self.window.title("Worksheet")
+        self.window.geometry("520x420")
+
+        form = ttkb.Frame(self.window, padding=10)
+        form.pack(fill=X)
+        self.statement_var = tk.StringVar()
+        entry = ttkb.Entry(form, textvariable=self.statement_var)
+        entry.pack(side=LEFT, fill=X, expand=True)
+        entry.bind("<Return>", lambda event: self.run())
+        ttkb.Button(form, text="Run", command=self.run, bootstyle="success").pack(side=LEFT, padx=5)
+        self.status_var = tk.StringVar(value="e.g.  rate = 0.2   price = 100   tax = price * rate   f(x) = x**2")
+        ttkb.Label(self.window, textvariable=self.status_var, padding=(10, 0)).pack(fill=X)
+
+        table_frame = ttkb.Frame(self.window, padding=10)
+        table_frame.pack(fill=BOTH, expand=True)
+        self.table = ttkb.Treeview(table_frame, columns=("name", "formula", "value"), show="headings")
+        for column, heading, width in (("name", "Name", 90), ("formula", "Formula", 220), ("value", "Value", 160)):
+            self.table.heading(column, text=heading)
+            self.table.column(column, width=width)
+        scrollbar = ttkb.Scrollbar(table_frame, orient=VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.table.pack(side=LEFT, fill=BOTH, expand=True)
+        self.table.bind("<Double-1>", lambda event: self.edit())
+
+        buttons = ttkb.Frame(self.window, padding=(10, 0, 10, 10))
+        buttons.pack(fill=X)
+        ttkb.Button(buttons, text="Edit", command=self.edit, bootstyle="outline-primary").pack(side=LEFT)
+        ttkb.Button(buttons, text="Remove", command=self.remove, bootstyle="outline-warning").pack(side=LEFT, padx=5)
+
+        self.worksheet.listeners.append(self.update_rows)
+        self.window.bind("<Destroy>", self.closed)
+        self.update_rows(list(self.worksheet.cells))
+        entry.focus_set()
+
+    def run(self):
+        statement = self.statement_var.get().strip()
+        if not statement:
+            return
+        self.status_var.set("Running…")
+        self.submit(statement, self.finished)
+
+    def finished(self, result, error):
+        if not self.window.winfo_exists():
+            return
+        if isinstance(error, EvaluationCancelled):
+            self.status_var.set("Cancelled")
+            return
+        if isinstance(error, ZeroDivisionError):
+            self.status_var.set("Error: division by zero")
+            return
+        if error is not None:
+            self.status_var.set(f"Error: {error}")
+            return
+        name, value = result
+        self.statement_var.set("")
+        if name is None:
+            self.status_var.set(f"= {format_result(value, DISPLAY_MAX_DIGITS)}")
+        else:
+            self.status_var.set(f"{name} = {format_result(value, DISPLAY_MAX_DIGITS)}" if value is not None
+                                else f"Defined {name}")
+
+    def update_rows(self, names):
+        """Redraw the rows of the named cells, adding or deleting rows as needed."""
+        for name in names:
+            cell = self.worksheet.cells.get(name)
+            if cell is None:
+                if self.table.exists(name):
+                    self.table.delete(name)
+                continue
+            if cell.error:
+                value = f"error: {cell.error}"
+            else:
+                value = "(function)" if cell.params is not None else format_result(cell.value, DISPLAY_MAX_DIGITS)
+            values = (cell.label(), cell.text, value)
+            if self.table.exists(name):
+                self.table.item(name, values=values)
+            else:
+                self.table.insert("", END, iid=name, values=values)
+
+    def edit(self):
+        """Put the selected definition in the entry for changing."""
+        for name in self.table.selection()[:1]:
+            cell = self.worksheet.cells[name]
+            self.statement_var.set(f"{cell.label()} = {cell.text}")
+
+    def remove(self):
+        for name in self.table.selection():
+            try:
+                self.worksheet.remove(name)
+            except ExpressionError as e:
+                self.status_var.set(f"Error: {e}")
+
+    def closed(self, event):
+        if event.widget is self.window and self.update_rows in self.worksheet.listeners:
+            self.worksheet.listeners.remove(self.update_rows)
+
 class CalculatorApp:
-    def __init__(self, root):
+    def __init__(self, root, history_path=HISTORY_FILE, timeout=EVALUATION_TIMEOUT, memory_mb=EVALUATION_MEMORY_MB):
         self.root = root
         self.root.title("Advanced Calculator")
         self.root.geometry("500x700")
@@ -43,12 +2036,23 @@ class CalculatorApp:
             }
         }
 
+        # Button styles for each color mode, applied in one pass whenever the theme changes
+        self.button_styles = {
+            mode: {
+                "Number.TButton": {"background": colors["number_btn"], "foreground": colors["number_text"]},
+                "Operator.TButton": {"background": colors["operator_btn"], "foreground": colors["operator_text"]},
+                "Warning.TButton": {"background": colors["special_btn_warning"], "foreground": colors["special_text"]},
+                "Success.TButton": {"background": colors["special_btn_success"], "foreground": colors["special_text"]},
+            }
+            for mode, colors in self.colors.items()
+        }
+
         # Set initial background color
         self.current_mode = "light"
         self.root.configure(bg=self.colors[self.current_mode]["bg"])
 
-        # History list to store past calculations
-        self.history = []
+        # Past calculations, kept on disk
+        self.history_store = HistoryStore(history_path)
 
         # Main frame
         self.main_frame = ttkb.Frame(self.root, padding=10, style="TFrame")
@@ -65,6 +2069,19 @@ class CalculatorApp:
         )
         self.display_entry.pack(fill=X, pady=5)
 
+        # Live preview of the result, refreshed shortly after each edit
+        self.preview_var = tk.StringVar()
+        self.preview_label = ttkb.Label(self.display_frame, textvariable=self.preview_var, font=("Helvetica", 12),
+                                        anchor="e")
+        self.preview_label.pack(fill=X)
+        self.preview_evaluator = PreviewEvaluator()
+        self.preview_job = None
+        self.display_var.trace_add("write", self.schedule_preview)
+
+        # Shown while the evaluation worker is busy
+        self.cancel_button = ttkb.Button(self.display_frame, text="Cancel", command=self.cancel_evaluation,
+                                         bootstyle="outline-danger")
+
         # Mode and Theme toggle buttons
         self.toggle_frame = ttkb.Frame(self.main_frame)
         self.toggle_frame.pack(fill=X, pady=5)
@@ -79,23 +2096,50 @@ class CalculatorApp:
         )
         self.theme_button.pack(side=RIGHT, padx=5)
 
-        # History panel (scrollable)
-        self.history_frame = ttkb.LabelFrame(self.main_frame, text="History", padding=5)
-        self.history_frame.pack(fill=BOTH, pady=5)
+        self.plot_button = ttkb.Button(
+            self.toggle_frame, text="📈 Table/Plot", command=self.open_plot, bootstyle="outline-primary"
+        )
+        self.plot_button.pack(side=RIGHT, padx=5)
+
+        self.worksheet_button = ttkb.Button(
+            self.toggle_frame, text="🧮 Worksheet", command=self.open_worksheet, bootstyle="outline-primary"
+        )
+        self.worksheet_button.pack(side=RIGHT, padx=5)
+        self.worksheet_window = None
+
+        # Precision mode: float, Decimal to a number of digits, or exact fractions
+        self.precision_frame = ttkb.Frame(self.main_frame)
+        self.precision_frame.pack(fill=X, pady=5)
 
-        self.history_canvas = tk.Canvas(self.history_frame, height=100, highlightthickness=0)
-        self.history_scrollbar = ttkb.Scrollbar(self.history_frame, orient=VERTICAL, command=self.history_canvas.yview)
-        self.history_inner_frame = ttkb.Frame(self.history_canvas)
+        ttkb.Label(self.precision_frame, text="Numbers:").pack(side=LEFT, padx=5)
+        self.number_mode_var = tk.StringVar(value="float")
+        self.number_mode_box = ttkb.Combobox(
+            self.precision_frame, textvariable=self.number_mode_var, values=NUMBER_MODES, state="readonly", width=9
+        )
+        self.number_mode_box.pack(side=LEFT, padx=5)
 
-        self.history_inner_frame.bind(
-            "<Configure>", lambda e: self.history_canvas.configure(scrollregion=self.history_canvas.bbox("all"))
+        ttkb.Label(self.precision_frame, text="Digits:").pack(side=LEFT, padx=5)
+        self.digits_var = tk.IntVar(value=DEFAULT_DIGITS)
+        self.digits_box = ttkb.Spinbox(
+            self.precision_frame, textvariable=self.digits_var, from_=1, to=MAX_DIGITS, state="readonly", width=5
         )
+        self.digits_box.pack(side=LEFT, padx=5)
+        self.number_mode_var.trace_add("write", self.change_precision)
+        self.digits_var.trace_add("write", self.change_precision)
 
-        self.history_canvas.configure(yscrollcommand=self.history_scrollbar.set)
-        self.history_canvas.create_window((0, 0), window=self.history_inner_frame, anchor="nw")
+        # Variables, user functions, ans and the memory register
+        self.worksheet = Worksheet(self.number_mode_var.get(), self.digits_var.get())
+        self.worksheet.listeners.append(self.worksheet_changed)
+        self.evaluation_worker = EvaluationWorker(self.worksheet, timeout, memory_mb)
+        self.evaluation_poll = None
 
-        self.history_scrollbar.pack(side=RIGHT, fill=Y)
-        self.history_canvas.pack(side=LEFT, fill=BOTH, expand=True)
+        # History panel (scrollable)
+        self.history_frame = ttkb.LabelFrame(self.main_frame, text="History", padding=5)
+        self.history_frame.pack(fill=BOTH, pady=5)
+
+        self.history_panel = HistoryPanel(
+            self.history_frame, self.history_store, self.recall_history, self.colors[self.current_mode]
+        )
 
         # Clear History Button
         self.clear_history_button = ttkb.Button(
@@ -103,19 +2147,32 @@ class CalculatorApp:
         )
         self.clear_history_button.pack(pady=5)
 
+        # Memory row
+        self.memory_frame = ttkb.Frame(self.main_frame)
+        self.memory_frame.pack(fill=X, pady=(0, 2))
+        for text, command in (("MC", self.memory_clear), ("MR", self.memory_recall), ("M+", lambda: self.memory_add(1)),
+                              ("M−", lambda: self.memory_add(-1)), ("ans", lambda: self.append_to_display("ans"))):
+            ttkb.Button(self.memory_frame, text=text, command=command, style="Operator.TButton", width=5).pack(
+                side=LEFT, padx=2, expand=True, fill=X)
+        self.memory_var = tk.StringVar(value=f"{MEMORY} = 0")
+        ttkb.Label(self.memory_frame, textvariable=self.memory_var, font=("Helvetica", 10)).pack(side=LEFT, padx=5)
+
         # Button frame
         self.button_frame = ttkb.Frame(self.main_frame)
         self.button_frame.pack(fill=BOTH, expand=True)
 
         # Initialize buttons
         self.buttons = {}
+        self.scientific_buttons = []
         self.update_colors()  # Set initial colors
         self.create_buttons()
+        self.show_layout()
 
         # Bind keyboard input
         self.root.bind("<Key>", self.handle_keypress)
         self.root.bind("<Return>", lambda event: self.calculate())
         self.root.bind("<BackSpace>", lambda event: self.backspace())
+        self.root.bind("<Escape>", lambda event: self.cancel_evaluation())
 
     def toggle_theme(self):
         """Toggle between light and dark mode."""
@@ -123,67 +2180,28 @@ class CalculatorApp:
         self.current_mode = "dark" if self.is_dark_mode else "light"
         self.style.theme_use("darkly" if self.is_dark_mode else "flatly")
         self.theme_button.configure(text="☀️ Light Mode" if self.is_dark_mode else "🌙 Dark Mode")
-        self.update_colors()
-        self.create_buttons()  # Recreate buttons to apply new colors
+        self.update_colors()  # Buttons pick up the new colors through their styles
 
     def update_colors(self):
         """Update the colors of the UI elements based on the current mode."""
         mode = self.current_mode
+        # Styles belong to a theme, so they are set again after every theme_use
+        for name, options in self.button_styles[mode].items():
+            self.style.configure(name, font=("Helvetica", 12), **options)
         self.root.configure(bg=self.colors[mode]["bg"])
-        self.history_canvas.configure(bg=self.colors[mode]["bg"])
+        self.history_panel.set_colors(self.colors[mode])
         self.history_frame.configure(bootstyle=f"secondary")  # Adjust frame style
         self.display_entry.configure(bootstyle=f"secondary")  # Adjust entry style
-        for widget in self.history_inner_frame.winfo_children():
-            widget.configure(foreground=self.colors[mode]["text"])
+        self.preview_label.configure(foreground=self.colors[mode]["text"])
 
     def toggle_mode(self):
         """Toggle between Standard and Scientific mode."""
         self.is_scientific_mode = not self.is_scientific_mode
         self.mode_button.configure(text="Scientific Mode" if not self.is_scientific_mode else "Standard Mode")
-        self.create_buttons()
+        self.show_layout()
 
     def create_buttons(self):
-        """Create calculator buttons based on the current mode with custom colors."""
-        # Clear existing buttons
-        for widget in self.button_frame.winfo_children():
-            widget.destroy()
-        self.buttons.clear()
-
-        mode = self.current_mode
-
-        # Define button styles
-        number_style = ttkb.Style()
-        number_style.configure(
-            "Number.TButton",
-            background=self.colors[mode]["number_btn"],
-            foreground=self.colors[mode]["number_text"],
-            font=("Helvetica", 12)
-        )
-
-        operator_style = ttkb.Style()
-        operator_style.configure(
-            "Operator.TButton",
-            background=self.colors[mode]["operator_btn"],
-            foreground=self.colors[mode]["operator_text"],
-            font=("Helvetica", 12)
-        )
-
-        warning_style = ttkb.Style()
-        warning_style.configure(
-            "Warning.TButton",
-            background=self.colors[mode]["special_btn_warning"],
-            foreground=self.colors[mode]["special_text"],
-            font=("Helvetica", 12)
-        )
-
-        success_style = ttkb.Style()
-        success_style.configure(
-            "Success.TButton",
-            background=self.colors[mode]["special_btn_success"],
-            foreground=self.colors[mode]["special_text"],
-            font=("Helvetica", 12)
-        )
-
+        """Create the buttons of both layouts once; show_layout decides which are on the grid."""
         # Button layout for standard mode
         button_layout = [
             ("C", 0, 0, self.clear, "Warning.TButton"),
@@ -208,34 +2226,167 @@ class CalculatorApp:
             ("=", 4, 3, self.calculate, "Success.TButton"),
         ]
 
-        # Add scientific buttons if in scientific mode
-        if self.is_scientific_mode:
-            scientific_buttons = [
-                ("√", 0, 4, lambda: self.append_to_display("sqrt("), "Operator.TButton"),
-                ("^", 1, 4, lambda: self.append_to_display("**"), "Operator.TButton"),
-                ("sin", 2, 4, lambda: self.append_to_display("sin("), "Operator.TButton"),
-                ("cos", 3, 4, lambda: self.append_to_display("cos("), "Operator.TButton"),
-                ("tan", 4, 4, lambda: self.append_to_display("tan("), "Operator.TButton"),
-                ("log", 5, 4, lambda: self.append_to_display("log10("), "Operator.TButton"),
-            ]
-            button_layout.extend(scientific_buttons)
+        # Extra column for scientific mode
+        scientific_layout = [
+            ("√", 0, 4, lambda: self.append_to_display("sqrt("), "Operator.TButton"),
+            ("^", 1, 4, lambda: self.append_to_display("**"), "Operator.TButton"),
+            ("sin", 2, 4, lambda: self.append_to_display("sin("), "Operator.TButton"),
+            ("cos", 3, 4, lambda: self.append_to_display("cos("), "Operator.TButton"),
+            ("tan", 4, 4, lambda: self.append_to_display("tan("), "Operator.TButton"),
+            ("log", 5, 4, lambda: self.append_to_display("log10("), "Operator.TButton"),
+            ("∫", 0, 5, lambda: self.append_to_display("integrate("), "Operator.TButton"),
+            ("solve", 1, 5, lambda: self.append_to_display("solve("), "Operator.TButton"),
+            ("d/dx", 2, 5, lambda: self.append_to_display("derivative("), "Operator.TButton"),
+            ("x", 3, 5, lambda: self.append_to_display("x"), "Number.TButton"),
+            (",", 4, 5, lambda: self.append_to_display(", "), "Operator.TButton"),
+        ]
 
         # Create buttons
-        for (text, row, col, command, style) in button_layout:
+        for (text, row, col, command, style) in button_layout + scientific_layout:
             btn = ttkb.Button(self.button_frame, text=text, command=command, style=style, width=5)
             btn.grid(row=row, column=col, padx=2, pady=2, sticky="nsew")
             self.buttons[text] = btn
+        self.scientific_buttons = [self.buttons[text] for text, *_ in scientific_layout]
 
         # Configure grid weights for responsiveness
-        for i in range(5 if not self.is_scientific_mode else 6):
+        for i in range(5):
             self.button_frame.grid_rowconfigure(i, weight=1)
-        for i in range(4 if not self.is_scientific_mode else 5):
+        for i in range(4):
             self.button_frame.grid_columnconfigure(i, weight=1)
 
+    def show_layout(self):
+        """Show or hide the scientific column; grid_remove keeps each button's place for next time."""
+        for btn in self.scientific_buttons:
+            if self.is_scientific_mode:
+                btn.grid()
+            else:
+                btn.grid_remove()
+        # Give the scientific row and column space only while they are shown
+        weight = 1 if self.is_scientific_mode else 0
+        self.button_frame.grid_rowconfigure(5, weight=weight)
+        self.button_frame.grid_columnconfigure(4, weight=weight)
+        self.button_frame.grid_columnconfigure(5, weight=weight)
+
+    def open_worksheet(self):
+        """Open the worksheet window, or raise it if it is already open."""
+        if self.worksheet_window is not None and self.worksheet_window.window.winfo_exists():
+            self.worksheet_window.window.lift()
+        else:
+            self.worksheet_window = WorksheetWindow(self.root, self.worksheet, self.submit_statement)
+
+    def submit_statement(self, statement, callback):
+        """Run a statement on the evaluation worker; callback(result, error) is called from the Tk loop."""
+        self.evaluation_worker.submit(statement, callback)
+        self.evaluation_started()
+
+    def evaluation_started(self):
+        """Show that the evaluation worker is busy and poll it until it is done."""
+        self.preview_var.set("Calculating…")
+        self.cancel_button.pack(anchor="e", pady=2)
+        if self.evaluation_poll is None:
+            self.evaluation_poll = self.root.after(EVALUATION_POLL_MS, self.poll_evaluation)
+
+    def poll_evaluation(self):
+        self.evaluation_poll = None
+        if self.evaluation_worker.poll():
+            self.evaluation_poll = self.root.after(EVALUATION_POLL_MS, self.poll_evaluation)
+        else:
+            self.cancel_button.pack_forget()
+
+    def cancel_evaluation(self):
+        """Stop the running calculation, if any, by killing the worker process."""
+        if self.evaluation_worker.busy():
+            self.evaluation_worker.cancel()
+            self.cancel_button.pack_forget()
+            self.schedule_preview()
+
+    def change_precision(self, *args):
+        """Recompute the worksheet in the new precision mode on the evaluation worker."""
+        try:
+            mode, digits = self.number_mode_var.get(), self.digits_var.get()
+            number_system(mode, digits)
+        except (ValueError, tk.TclError):
+            return  # digits box mid-edit
+        self.evaluation_worker.set_mode(mode, digits, self.precision_changed)
+        self.evaluation_started()
+
+    def precision_changed(self, result, error):
+        if error is not None:
+            # The worksheet kept its mode, so show that one again
+            if not isinstance(error, EvaluationCancelled):
+                messagebox.showerror("Error", f"Could not switch precision: {error}")
+            self.number_mode_var.set(self.worksheet.mode)
+            self.digits_var.set(self.worksheet.digits)
+        self.schedule_preview()
+
+    def worksheet_changed(self, names):
+        if MEMORY in names:
+            self.memory_var.set(f"{MEMORY} = {format_result(self.worksheet.env.get(MEMORY, 0), DISPLAY_MAX_DIGITS)}")
+        self.schedule_preview()
+
+    def memory_add(self, sign):
+        """M+ and M−: add the value of the display to the memory register, or subtract it."""
+        expression = self.display_var.get().strip()
+        if not expression:
+            return
+        operator_text = "+" if sign > 0 else "-"
+        self.evaluation_worker.assign(MEMORY, f"{MEMORY} {operator_text} ({expression})", self.memory_changed)
+        self.evaluation_started()
+
+    def memory_changed(self, cell, error):
+        """Report a failed M+, M− or MC; the memory label follows the worksheet by itself."""
+        if error is None or isinstance(error, EvaluationCancelled):
+            return
+        if isinstance(error, ZeroDivisionError):
+            messagebox.showerror("Error", "Division by zero is not allowed!")
+        elif isinstance(error, (TimeoutError, MemoryError)):
+            messagebox.showerror("Error", str(error))
+        else:
+            messagebox.showerror("Error", f"Invalid expression: {str(error)}")
+
+    def memory_recall(self):
+        """MR: append the memory register's value to the display."""
+        value = format_result(self.worksheet.env.get(MEMORY, 0))
+        self.append_to_display(f"({value})" if value.startswith("-") or "/" in value else value)
+
+    def memory_clear(self):
+        # Cells using M are recomputed, so this goes through the worker too
+        self.evaluation_worker.assign(MEMORY, "0", self.memory_changed)
+        self.evaluation_started()
+
+    def open_plot(self):
+        """Open the table and plot window for the expression in the display."""
+        PlotWindow(self.root, self.display_var.get(), self.colors[self.current_mode])
+
+    def schedule_preview(self, *args):
+        """Refresh the preview once edits pause for PREVIEW_DELAY_MS."""
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(PREVIEW_DELAY_MS, self.update_preview)
+
+    def update_preview(self):
+        """Show the value of the display, or nothing while it is incomplete or invalid."""
+        self.preview_job = None
+        expression = self.display_var.get()
+        value = None
+        if expression.strip():
+            value = self.preview_evaluator.preview(expression, self.number_mode_var.get(), self.digits_var.get(),
+                                                   self.worksheet)
+        try:
+            text = None if value is None else format_result(value, DISPLAY_MAX_DIGITS)
+        except ValueError:
+            text = None
+        # No point previewing a number as itself, e.g. just after "="
+        self.preview_var.set("" if text is None or text == expression.strip() else f"= {text}")
+
     def clear_history(self):
-        """Clear the history list and update the history panel."""
-        self.history = []  # Clear the history list
-        self.update_history()  # Refresh the history panel
+        """Delete the stored history and update the history panel."""
+        self.history_store.clear()
+        self.history_panel.refresh()
+
+    def recall_history(self, entry):
+        """Put a past expression back in the display."""
+        self.display_var.set(entry.expression)
 
     def append_to_display(self, char):
         """Append a character to the display."""
@@ -252,49 +2403,47 @@ class CalculatorApp:
         self.display_var.set(current[:-1])
 
     def calculate(self):
-        """Evaluate the expression in the display and handle errors."""
+        """Evaluate the expression in the display on the evaluation worker, so the window stays responsive."""
         expression = self.display_var.get()
         if not expression:
             return
+        mode = self.number_mode_var.get()
+        self.submit_statement(expression, lambda result, error: self.calculated(expression, mode, result, error))
 
+    def calculated(self, expression, mode, result, error):
+        """Show a finished calculation and add it to the history, or report why it failed."""
+        if isinstance(error, EvaluationCancelled):
+            return
+        if isinstance(error, (TimeoutError, MemoryError)):
+            # The expression may be fine, just too costly; leave it for editing
+            messagebox.showerror("Error", str(error))
+            self.schedule_preview()
+            return
         try:
-            # Replace scientific functions with numpy equivalents
-            expression = expression.replace("sin(", "np.sin(np.radians(")
-            expression = expression.replace("cos(", "np.cos(np.radians(")
-            expression = expression.replace("tan(", "np.tan(np.radians(")
-            expression = expression.replace("sqrt(", "np.sqrt(")
-            expression = expression.replace("log10(", "np.log10(")
-
-            # Evaluate the expression
-            result = eval(expression, {"np": np, "math": math})
-            self.display_var.set(str(result))
-
-            # Add to history
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.history.append(f"{timestamp}: {expression} = {result}")
-            self.update_history()
-
+            if error is not None:
+                raise error
+            name, result = result
+            # A function definition has no value; clear the display for the next entry
+            text = "" if result is None else format_result(result, DISPLAY_MAX_DIGITS)
         except ZeroDivisionError:
             messagebox.showerror("Error", "Division by zero is not allowed!")
             self.clear()
+            return
         except Exception as e:
             messagebox.showerror("Error", f"Invalid expression: {str(e)}")
             self.clear()
+            return
+        # Keep anything typed while it was running
+        if self.display_var.get() == expression:
+            self.display_var.set(text)
 
-    def update_history(self):
-        """Update the history panel with past calculations."""
-        for widget in self.history_inner_frame.winfo_children():
-            widget.destroy()
-
-        # Show last 10 entries
-        for entry in self.history[-10:]:
-            label = ttkb.Label(
-                self.history_inner_frame, 
-                text=entry, 
-                font=("Helvetica", 10), 
-                foreground=self.colors[self.current_mode]["text"]
-            )
-            label.pack(anchor="w", pady=2)
+        # Add to history
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self.history_store.append(HistoryEntry(timestamp, expression, "defined" if result is None else text, mode))
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save history: {e}")
+        self.history_panel.refresh()
 
     def handle_keypress(self, event):
         """Handle keyboard input for numbers, operators, and other keys."""
@@ -313,8 +2462,30 @@ class CalculatorApp:
             self.append_to_display("log10(")
         elif char.lower() == "r" and self.is_scientific_mode:
             self.append_to_display("sqrt(")
+        elif char in ("x", ",") and self.is_scientific_mode:
+            self.append_to_display(char)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Advanced Calculator")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="evaluate each line of FILE (- for stdin) and print the results instead of opening the window")
+    parser.add_argument("--mode", choices=NUMBER_MODES, default="float", help="precision mode (default: float)")
+    parser.add_argument("--digits", type=int, default=DEFAULT_DIGITS,
+                        help=f"significant digits for decimal results (default: {DEFAULT_DIGITS})")
+    parser.add_argument("--workers", type=int, help="worker processes for --batch (default: one per CPU)")
+    parser.add_argument("--history", default=HISTORY_FILE, help=f"history file (default: {HISTORY_FILE})")
+    parser.add_argument("--timeout", type=float, default=EVALUATION_TIMEOUT,
+                        help=f"seconds a calculation may run before it is stopped (default: {EVALUATION_TIMEOUT})")
+    parser.add_argument("--memory", type=int, default=EVALUATION_MEMORY_MB,
+                        help=f"memory limit in MB for a calculation, where supported (default: {EVALUATION_MEMORY_MB})")
+    args = parser.parse_args()
+    if args.batch:
+        try:
+            errors = run_batch(args.batch, args.mode, args.digits, args.workers)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        # Exit status 1 if any line failed, so regression checks can test for it
+        sys.exit(1 if errors else 0)
     root = ttkb.Window()
-    app = CalculatorApp(root)
+    app = CalculatorApp(root, args.history, args.timeout, args.memory)
     root.mainloop()
\ No newline at end of file
@@ -1,17 +1,499 @@
+import os
 import sys
+import re
+import uuid
+import socket
+import socketserver
+import argparse
+import logging
+import threading
+import types
+import time as clock
+import csv
+import json
+import queue
+import heapq
 import sqlite3
-from datetime import datetime, date
+from itertools import islice
+from contextlib import contextmanager
+from bisect import bisect_left
+from calendar import monthrange
+from datetime import datetime, date, time, timedelta
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
                     QPushButton, QLineEdit, QComboBox, QDateEdit, QListWidget, QListWidgetItem,
-                    QLabel, QCheckBox, QFrame, QMessageBox, QDialog)
-from PyQt5.QtCore import Qt, QDate, QPropertyAnimation, QRect
+                    QLabel, QCheckBox, QFrame, QMessageBox, QDialog, QSpinBox, QFileDialog, QProgressDialog,
+                    QSystemTrayIcon, QInputDialog, QPlainTextEdit)
+from PyQt5.QtCore import Qt, QDate, QPropertyAnimation, QRect, QObject, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont
 
+# Change events emitted by task mutations
+class TaskChange:
+    """Describes how a single mutation affected one task row."""
+    INSERTED = "inserted"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    MOVED = "moved"  # completed or daily flag changed, so the task switches tabs
+
+    def __init__(self, kind, task_id, task=None, old_task=None):
+        self.kind = kind
+        self.task_id = task_id
+        self.task = task
+        self.old_task = old_task
+
+    @classmethod
+    def between(cls, task_id, old_task, new_task):
+        """Classify the change from the row before to the row after a mutation."""
+        if old_task is None and new_task is None:
+            kind = cls.DELETED  # the task was already gone
+        elif old_task is None:
+            kind = cls.INSERTED
+        elif new_task is None:
+            kind = cls.DELETED
+        elif (old_task.completed, old_task.is_daily) != (new_task.completed, new_task.is_daily):
+            kind = cls.MOVED
+        else:
+            kind = cls.UPDATED
+        return cls(kind, task_id, new_task, old_task)
+
+    def __repr__(self):
+        return f"TaskChange({self.kind!r}, {self.task_id!r})"
+
+# Recurrence rules
+class Recurrence:
+    """A subset of iCalendar RRULEs: FREQ=DAILY|WEEKLY|MONTHLY with INTERVAL, BYDAY and BYMONTHDAY.
+
+    Occurrences are anchored at a start date (the task's due date, or its
+    creation date when it has none).
+    """
+    WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+    FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+
+    def __init__(self, rule):
+        parts = {}
+        for part in rule.upper().replace(" ", "").split(";"):
+            key, _, value = part.partition("=")
+            if key:
+                parts[key] = value
+        try:
+            if parts.get("FREQ") not in self.FREQUENCIES:
+                raise ValueError
+            self.freq = parts["FREQ"]
+            self.interval = int(parts.get("INTERVAL") or 1)
+            self.by_day = (tuple(sorted({self.WEEKDAYS.index(day) for day in parts["BYDAY"].split(",")}))
+                           if parts.get("BYDAY") else None)
+            self.by_month_day = int(parts["BYMONTHDAY"]) if parts.get("BYMONTHDAY") else None
+            if self.interval < 1 or not 1 <= (self.by_month_day or 1) <= 31:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Unsupported recurrence rule: {rule}") from None
+
+    @property
+    def rule(self):
+        """The canonical RRULE text."""
+        rule = f"FREQ={self.freq}"
+        if self.interval > 1:
+            rule += f";INTERVAL={self.interval}"
+        if self.by_day:
+            rule += ";BYDAY=" + ",".join(self.WEEKDAYS[day] for day in self.by_day)
+        if self.by_month_day:
+            rule += f";BYMONTHDAY={self.by_month_day}"
+        return rule
+
+    def describe(self):
+        """Short human-readable summary, e.g. 'Weekly on Mo, We'."""
+        unit = {"DAILY": "day", "WEEKLY": "week", "MONTHLY": "month"}[self.freq]
+        text = self.freq.capitalize() if self.interval == 1 else f"Every {self.interval} {unit}s"
+        if self.by_day == (0, 1, 2, 3, 4) and self.freq == "DAILY" and self.interval == 1:
+            return "Weekdays"
+        if self.by_day:
+            text += " on " + ", ".join(self.WEEKDAYS[day].capitalize() for day in self.by_day)
+        if self.by_month_day:
+            text += f" on day {self.by_month_day}"
+        return text
+
+    def first_on_or_after(self, start, day):
+        """The first occurrence of the series anchored at start that falls on or after day."""
+        day = max(day, start)
+        if self.freq == "MONTHLY":
+            month_day = self.by_month_day or start.day
+            months = (day.year - start.year) * 12 + day.month - start.month
+            for month in range(months - months % self.interval, months + 2 * self.interval + 1, self.interval):
+                year, month_index = divmod(start.month - 1 + month, 12)
+                year += start.year
+                candidate = date(year, month_index + 1, min(month_day, monthrange(year, month_index + 1)[1]))
+                if candidate >= day:
+                    return candidate
+        weekdays = self.by_day or ((start.weekday(),) if self.freq == "WEEKLY" else None)
+        week_start = start - timedelta(days=start.weekday())
+        for offset in range(7 * self.interval + 7):  # covers one full cycle of the rule
+            candidate = day + timedelta(days=offset)
+            if self.freq == "DAILY":
+                period = (candidate - start).days
+            else:
+                period = (candidate - week_start).days // 7
+            if period % self.interval == 0 and (weekdays is None or candidate.weekday() in weekdays):
+                return candidate
+        raise ValueError(f"Recurrence {self.rule} never occurs")
+
+def schedule_next_due(due_date, recurrence, created_at, after=None):
+    """Compute a task's next_due: its due date, or for recurring tasks the next occurrence.
+
+    Recurring tasks get their first occurrence on or after today, or strictly
+    after the date given in after (the occurrence just completed).
+    """
+    if not recurrence:
+        return due_date
+    start = date.fromisoformat(due_date or (created_at or date.today().isoformat())[:10])
+    day = date.today() if after is None else date.fromisoformat(after) + timedelta(days=1)
+    return Recurrence(recurrence).first_on_or_after(start, day).isoformat()
+
+# Columns shared by the tasks and tasks_archive tables
+TASK_FIELDS = ("id", "title", "category", "due_date", "completed", "created_at", "is_daily",
+               "daily_completed_date", "completed_at", "recurrence", "next_due", "uid")
+TASK_COLUMNS = ", ".join(TASK_FIELDS)
+
+# What the task lists render and sort on
+LIST_FIELDS = tuple(field for field in TASK_FIELDS if field not in ("created_at", "uid"))
+
+# Fields exchanged by sync, each resolved last-writer-wins on its own
+SYNC_FIELDS = ("title", "category", "due_date", "completed", "created_at", "is_daily", "daily_completed_date",
+               "completed_at", "recurrence", "next_due")
+DEFAULT_SYNC_PORT = 8765
+
+# Rows per fetchmany() call, and per chunk a streamed request delivers
+FETCH_CHUNK_SIZE = 500
+
+# Task records
+class Task:
+    """One task row, with attribute access by column name.
+
+    Built by Task.row_factory from whichever columns a query selected;
+    the others are None.
+    """
+    __slots__ = TASK_FIELDS
+
+    def __init__(self, **fields):
+        for field in TASK_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """sqlite3 row factory; set it on a cursor, not the connection, so other queries keep tuples."""
+        return cls(**{column[0]: value for column, value in zip(cursor.description, row)})
+
+    def __repr__(self):
+        return f"Task({self.id!r}, {self.title!r})"
+
+
+# Time of day at which tasks due on a date are reminded about
+REMINDER_TIME = time(9, 0)
+
+# Completed tasks are loaded this many at a time
+COMPLETED_PAGE_SIZE = 50
+
+# Bulk import/export
+TRANSFER_FIELDS = ("title", "category", "due_date", "is_daily", "completed", "created_at", "completed_at",
+                   "recurrence")
+TRANSFER_CHUNK_SIZE = 1000
+
+def _flag(value):
+    """Parse a boolean-ish field from an imported file."""
+    return 1 if str(value).strip().lower() in ("1", "true", "yes", "y", "x") else 0
+
+def read_csv_tasks(f):
+    """Yield task dicts from a CSV file with a header row."""
+    for row in csv.DictReader(f):
+        yield {key.strip().lower(): value for key, value in row.items() if key}
+
+def write_csv_tasks(f, tasks):
+    """Write task dicts as CSV."""
+    writer = csv.DictWriter(f, fieldnames=TRANSFER_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for task in tasks:
+        writer.writerow(task)
+
+def read_jsonl_tasks(f):
+    """Yield task dicts from a JSON Lines file."""
+    for line_number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {line_number}: {e}") from None
+
+def write_jsonl_tasks(f, tasks):
+    """Write task dicts as JSON Lines."""
+    for task in tasks:
+        f.write(json.dumps({field: task[field] for field in TRANSFER_FIELDS}) + "\n")
+
+def _ical_escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\n", "\\n"))
+
+def _ical_unescape(text):
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), text)
+
+def _ical_fold(line):
+    """Fold a content line to 75 octets as RFC 5545 requires."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74  # continuation lines start with a space
+        while cut and (data[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+def _ical_datetime(value):
+    """Convert 'YYYY-MM-DD HH:MM:SS' to an iCalendar local date-time."""
+    return value.replace("-", "").replace(":", "").replace(" ", "T")
+
+def _from_ical_date(value):
+    """Convert an iCalendar DATE or DATE-TIME to 'YYYY-MM-DD'."""
+    return f"{value[0:4]}-{value[4:6]}-{value[6:8]}" if len(value) >= 8 else None
+
+def _from_ical_datetime(value):
+    """Convert an iCalendar DATE-TIME to 'YYYY-MM-DD HH:MM:SS'."""
+    if len(value) < 15:
+        return _from_ical_date(value) and _from_ical_date(value) + " 00:00:00"
+    return f"{_from_ical_date(value)} {value[9:11]}:{value[11:13]}:{value[13:15]}"
+
+def _unfold_ical(f):
+    """Yield logical content lines, joining folded continuation lines."""
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def read_ical_tasks(f):
+    """Yield task dicts from the VTODO components of an iCalendar file."""
+    task = None
+    for line in _unfold_ical(f):
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() == "VTODO":
+            task = {}
+        elif name == "END" and value.upper() == "VTODO" and task is not None:
+            yield task
+            task = None
+        elif task is None:
+            continue
+        elif name == "SUMMARY":
+            task["title"] = _ical_unescape(value)
+        elif name == "CATEGORIES":
+            task["category"] = _ical_unescape(re.split(r"(?<!\\),", value)[0])
+        elif name == "DUE":
+            task["due_date"] = _from_ical_date(value)
+        elif name == "STATUS":
+            task["completed"] = int(value.upper() == "COMPLETED")
+        elif name == "COMPLETED":
+            task["completed_at"] = _from_ical_datetime(value)
+        elif name == "CREATED":
+            task["created_at"] = _from_ical_datetime(value)
+        elif name == "RRULE":
+            task["recurrence"] = value
+            task["is_daily"] = 1
+
+def write_ical_tasks(f, tasks):
+    """Write task dicts as VTODO components of one iCalendar file."""
+    f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//CODSOFT//To-Do List App//EN\r\n")
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    for task in tasks:
+        lines = ["BEGIN:VTODO", f"UID:task-{task['id']}@todo.db", f"DTSTAMP:{stamp}",
+                 "SUMMARY:" + _ical_escape(task["title"] or "")]
+        if task["category"]:
+            lines.append("CATEGORIES:" + _ical_escape(task["category"]))
+        if task["due_date"]:
+            lines.append("DUE;VALUE=DATE:" + task["due_date"].replace("-", ""))
+        if task["created_at"]:
+            lines.append("CREATED:" + _ical_datetime(task["created_at"]))
+        if task["recurrence"]:
+            lines.append("RRULE:" + task["recurrence"])
+        lines.append("STATUS:" + ("COMPLETED" if task["completed"] else "NEEDS-ACTION"))
+        if task["completed"] and task["completed_at"]:
+            lines.append("COMPLETED:" + _ical_datetime(task["completed_at"]))
+        lines.append("END:VTODO")
+        f.write("".join(_ical_fold(line) for line in lines))
+    f.write("END:VCALENDAR\r\n")
+
+TASK_FORMATS = {
+    "csv": (read_csv_tasks, write_csv_tasks),
+    "jsonl": (read_jsonl_tasks, write_jsonl_tasks),
+    "ics": (read_ical_tasks, write_ical_tasks),
+}
+TASK_FORMAT_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".ics": "ics", ".ical": "ics"}
+
+def task_format_for_path(path):
+    """Pick an import/export format from a file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in TASK_FORMAT_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{extension}'; use .csv, .jsonl or .ics")
+    return TASK_FORMAT_EXTENSIONS[extension]
+
+# Opt-in performance instrumentation
+class OperationStats:
+    """Counters for one instrumented operation."""
+    __slots__ = ("count", "rows", "total_ms", "max_ms", "histogram")
+    BUCKETS = 16  # bucket b holds calls under 2**b ms; the last one is open-ended
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * self.BUCKETS
+
+    def add(self, ms, rows):
+        self.count += 1
+        self.rows += rows
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.histogram[min(int(ms).bit_length(), self.BUCKETS - 1)] += 1
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram_ms": {(f"<{2 ** b}" if b < self.BUCKETS - 1 else f">={2 ** (b - 1)}"): n
+                             for b, n in enumerate(self.histogram) if n},
+        }
+
+class Instrumentation:
+    """Records call counts, rows returned and latency histograms per operation.
+
+    Off unless the app is started with --instrument or TODO_INSTRUMENT=1;
+    when off nothing is wrapped, so it costs nothing. Calls slower than
+    slow_ms are logged to the "todo.slow" logger, which writes to
+    slow_log_path if given. Safe to record from any thread.
+    """
+    def __init__(self, slow_ms=100, slow_log_path=None, dump_path=None):
+        self.slow_ms = slow_ms
+        self.dump_path = dump_path
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.slow_log = logging.getLogger("todo.slow")
+        if slow_log_path:
+            handler = logging.FileHandler(slow_log_path, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(threadName)s %(message)s"))
+            self.slow_log.addHandler(handler)
+
+    @staticmethod
+    def count_rows(args, result):
+        """Rows returned by a call: the length of a list result."""
+        return len(result) if isinstance(result, (list, tuple)) else 0
+
+    @staticmethod
+    def count_input_rows(args, result):
+        """Rows passed to a call, for methods like TaskListView.reload that take a list of tasks."""
+        return len(args[0]) if args and isinstance(args[0], (list, tuple)) else 1
+
+    def record(self, name, seconds, rows=0, args=()):
+        """Add one call of an operation; log it if it was slow."""
+        ms = seconds * 1000
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = OperationStats()
+            stats.add(ms, rows)
+        if ms >= self.slow_ms:
+            self.slow_log.warning("%s took %.1f ms, %d rows, args %.200r", name, ms, rows, args)
+
+    def timed(self, name, function, count_rows=None):
+        """Wrap a callable so each call is recorded under name. Generators are timed until exhausted."""
+        count_rows = count_rows or self.count_rows
+
+        def wrapper(*args, **kwargs):
+            start = clock.perf_counter()
+            result = function(*args, **kwargs)
+            if isinstance(result, types.GeneratorType):
+                return self._timed_rows(name, result, start, args)
+            self.record(name, clock.perf_counter() - start, count_rows(args, result), args)
+            return result
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def _timed_rows(self, name, rows, start, args):
+        count = 0
+        try:
+            for row in rows:
+                count += 1
+                yield row
+        finally:
+            self.record(name, clock.perf_counter() - start, count, args)
+
+    def wrap(self, obj, names, prefix, count_rows=None):
+        """Replace the named methods on one object with timed versions."""
+        for name in names:
+            setattr(obj, name, self.timed(prefix + name, getattr(obj, name), count_rows))
+
+    def watch_worker(self, worker):
+        """Record each DatabaseWorker request from submit() until its callback has run on the GUI thread."""
+        started = {}
+        submit = worker.submit
+        deliver = worker.deliver
+
+        def timed_submit(method, *args, **kwargs):
+            request_id = submit(method, *args, **kwargs)
+            started[request_id] = (method, clock.perf_counter())
+            return request_id
+
+        def timed_deliver(request_id, result, error):
+            method, start = started.pop(request_id)
+            try:
+                deliver(request_id, result, error)
+            finally:
+                self.record("roundtrip." + method, clock.perf_counter() - start, self.count_rows((), result))
+
+        worker.submit = timed_submit
+        worker.request_done.disconnect(worker.deliver)
+        worker.request_done.connect(timed_deliver)
+
+    def snapshot(self):
+        """All counters as plain data, slowest total first."""
+        with self.lock:
+            items = sorted(self.stats.items(), key=lambda item: -item[1].total_ms)
+            return {name: stats.as_dict() for name, stats in items}
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def report(self):
+        """A fixed-width text table of the snapshot."""
+        lines = [f"{'operation':<40} {'calls':>7} {'rows':>9} {'total ms':>11} {'mean ms':>9} {'max ms':>9}"]
+        for name, stats in self.snapshot().items():
+            lines.append(f"{name:<40} {stats['count']:>7} {stats['rows']:>9} {stats['total_ms']:>11.1f} "
+                         f"{stats['mean_ms']:>9.2f} {stats['max_ms']:>9.1f}")
+            lines.append("    " + "  ".join(f"{bucket}ms: {n}" for bucket, n in stats["histogram_ms"].items()))
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """Write the snapshot as JSON to path, or to dump_path."""
+        with open(path or self.dump_path, "w", encoding="utf-8") as f:
+            json.dump({"slow_ms": self.slow_ms, "operations": self.snapshot()}, f, indent=2)
+
 # Database handling
 class Database:
     def __init__(self, db_name="todo.db"):
         self.conn = sqlite3.connect(db_name)
         self.cursor = self.conn.cursor()
+        # WAL keeps commits cheap and lets readers work alongside the writer
+        self.cursor.execute("PRAGMA journal_mode = WAL")
+        self.cursor.execute("PRAGMA synchronous = NORMAL")
         self.create_tables()
         self.upgrade_schema()
 
@@ -27,6 +509,12 @@ class Database:
                 created_at TEXT
             )
         ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
         self.conn.commit()
 
     def upgrade_schema(self):
@@ -42,26 +530,565 @@ class Database:
         if 'daily_completed_date' not in columns:
             self.cursor.execute("ALTER TABLE tasks ADD COLUMN daily_completed_date TEXT")
             self.conn.commit()
+        # Add completed_at column if missing, back-filling existing completions with their creation time
+        if 'completed_at' not in columns:
+            self.cursor.execute("ALTER TABLE tasks ADD COLUMN completed_at TEXT")
+            self.cursor.execute("UPDATE tasks SET completed_at = COALESCE(created_at, '') WHERE completed = 1")
+            self.conn.commit()
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed_at ON tasks (completed, completed_at, id)")
+        # Add recurrence rule and precomputed next occurrence; daily tasks become FREQ=DAILY
+        if 'recurrence' not in columns:
+            self.cursor.execute("ALTER TABLE tasks ADD COLUMN recurrence TEXT")
+            self.cursor.execute("ALTER TABLE tasks ADD COLUMN next_due TEXT")
+            self.cursor.execute("UPDATE tasks SET recurrence = 'FREQ=DAILY' WHERE is_daily = 1")
+            self.cursor.execute("UPDATE tasks SET next_due = due_date WHERE recurrence IS NULL")
+            self.cursor.execute("SELECT id, due_date, recurrence, created_at, daily_completed_date FROM tasks "
+                                "WHERE recurrence IS NOT NULL")
+            self.cursor.executemany("UPDATE tasks SET next_due = ? WHERE id = ?", [
+                (schedule_next_due(due_date, recurrence, created_at, done_on), task_id)
+                for task_id, due_date, recurrence, created_at, done_on in self.cursor.fetchall()])
+            self.conn.commit()
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_next_due ON tasks (completed, next_due)")
+        # Completed tasks past the archive age move here and are only read on demand
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tasks_archive (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                category TEXT,
+                due_date TEXT,
+                completed INTEGER DEFAULT 1,
+                created_at TEXT,
+                is_daily INTEGER DEFAULT 0,
+                daily_completed_date TEXT,
+                completed_at TEXT
+            )
+        ''')
+        self.cursor.execute("PRAGMA table_info(tasks_archive)")
+        if 'recurrence' not in [info[1] for info in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE tasks_archive ADD COLUMN recurrence TEXT")
+            self.cursor.execute("ALTER TABLE tasks_archive ADD COLUMN next_due TEXT")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_completed_at ON tasks_archive (completed_at, id)")
+        self.conn.commit()
+        # Add the append-only daily completion history, seeded from current state
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_completions'")
+        if self.cursor.fetchone() is None:
+            self.cursor.execute('''
+                CREATE TABLE task_completions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id INTEGER NOT NULL,
+                    date TEXT NOT NULL,
+                    completed_at TEXT
+                )
+            ''')
+            self.cursor.execute("CREATE UNIQUE INDEX idx_task_completions_task_date ON task_completions (task_id, date)")
+            self.cursor.execute("CREATE INDEX idx_task_completions_date ON task_completions (date)")
+            self.cursor.execute('''
+                INSERT INTO task_completions (task_id, date, completed_at)
+                SELECT id, daily_completed_date, daily_completed_date FROM tasks
+                WHERE daily_completed_date IS NOT NULL
+            ''')
+            self.conn.commit()
+        self.has_fts = self.create_search_index()
+        self.replica_id = self.create_change_log()
+
+    def create_search_index(self):
+        """Create the FTS5 title index and its sync triggers. Returns False if FTS5 is unavailable."""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+        if self.cursor.fetchone() is not None:
+            return True
+        try:
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                    title, content='tasks', content_rowid='id', prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+        self.cursor.executescript('''
+            CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+            END;
+            CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            END;
+            CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+                INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+            END;
+            INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild');
+        ''')
+        self.conn.commit()
+        return True
+
+    def create_change_log(self):
+        """Give tasks sync ids and record every field change in change_log. Returns this replica's id.
 
-    def add_task(self, title, category, due_date, is_daily):
-        """Add a new task."""
+        Triggers log one row per changed field, stamped with the UTC time and
+        the replica that made it. They stay quiet while the sync_applying
+        flag is set in app_meta, so applied remote changes keep their origin.
+        """
+        self.cursor.execute("PRAGMA table_info(tasks)")
+        if 'uid' not in [info[1] for info in self.cursor.fetchall()]:
+            # Derived from id and creation time, so copies of one todo.db agree on the ids of their shared tasks
+            self.cursor.execute("ALTER TABLE tasks ADD COLUMN uid TEXT")
+            self.cursor.execute("UPDATE tasks SET uid = printf('%d-%s', id, COALESCE(created_at, ''))")
+        self.cursor.execute("PRAGMA table_info(tasks_archive)")
+        if 'uid' not in [info[1] for info in self.cursor.fetchall()]:
+            self.cursor.execute("ALTER TABLE tasks_archive ADD COLUMN uid TEXT")
+            self.cursor.execute("UPDATE tasks_archive SET uid = printf('%d-%s', id, COALESCE(created_at, ''))")
+        self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_uid ON tasks (uid)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_uid ON tasks_archive (uid)")
+        replica_id = self.get_meta("replica_id")
+        if replica_id is None:
+            replica_id = uuid.uuid4().hex
+            self.cursor.execute("INSERT INTO app_meta (key, value) VALUES ('replica_id', ?)", (replica_id,))
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'")
+        if self.cursor.fetchone() is not None:
+            # Logs made before archived tasks were seeded lack the ones archived by then
+            self.seed_change_log("tasks_archive", replica_id)
+            self.conn.commit()
+            return replica_id
+        self.cursor.execute('''
+            CREATE TABLE change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value,
+                modified_at TEXT NOT NULL,
+                origin TEXT NOT NULL
+            )
+        ''')
+        self.cursor.execute("CREATE INDEX idx_change_log_field ON change_log (uid, field, seq)")
+        self.seed_change_log("tasks", replica_id)
+        self.seed_change_log("tasks_archive", replica_id)
+        stamp = ("strftime('%Y-%m-%dT%H:%M:%fZ', 'now'), "
+                 "(SELECT value FROM app_meta WHERE key = 'replica_id')")
+        quiet = "NOT EXISTS (SELECT 1 FROM app_meta WHERE key = 'sync_applying')"
+        inserted = ",\n".join(f"((SELECT uid FROM tasks WHERE id = new.id), '{field}', new.{field}, {stamp})"
+                              for field in SYNC_FIELDS)
+        triggers = [f'''
+            CREATE TRIGGER change_log_insert AFTER INSERT ON tasks WHEN {quiet} BEGIN
+                UPDATE tasks SET uid = lower(hex(randomblob(16))) WHERE id = new.id AND uid IS NULL;
+                INSERT INTO change_log (uid, field, value, modified_at, origin) VALUES {inserted};
+            END;
+            CREATE TRIGGER change_log_delete AFTER DELETE ON tasks WHEN {quiet} BEGIN
+                INSERT INTO change_log (uid, field, value, modified_at, origin) VALUES (old.uid, 'deleted', 1, {stamp});
+            END;
+        ''']
+        for field in SYNC_FIELDS:
+            triggers.append(f'''
+                CREATE TRIGGER change_log_update_{field} AFTER UPDATE OF {field} ON tasks
+                WHEN old.{field} IS NOT new.{field} AND {quiet} BEGIN
+                    INSERT INTO change_log (uid, field, value, modified_at, origin)
+                    VALUES (new.uid, '{field}', new.{field}, {stamp});
+                END;
+            ''')
+        for trigger in triggers:
+            self.cursor.executescript(trigger)
+        self.conn.commit()
+        return replica_id
+
+    def seed_change_log(self, table, replica_id):
+        """Log the fields of the rows of table (tasks or tasks_archive) that are not logged yet, so peers get them.
+
+        They get the oldest possible timestamp, so any real edit wins over them.
+        """
+        for field in SYNC_FIELDS:
+            self.cursor.execute(f"INSERT INTO change_log (uid, field, value, modified_at, origin) "
+                                f"SELECT uid, '{field}', {field}, '', ? FROM {table} "
+                                f"WHERE uid NOT IN (SELECT uid FROM change_log WHERE field = '{field}')",
+                                (replica_id,))
+
+    def get_meta(self, key, default=None):
+        """Read a value from the app_meta key/value table."""
+        self.cursor.execute("SELECT value FROM app_meta WHERE key = ?", (key,))
+        row = self.cursor.fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        """Store a value in the app_meta key/value table."""
+        self.cursor.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def add_task(self, title, category, due_date, is_daily, recurrence=None):
+        """Add a new task and return the resulting change.
+
+        A daily task without an explicit rule recurs with FREQ=DAILY.
+        """
         created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if is_daily and not recurrence:
+            recurrence = "FREQ=DAILY"
+        recurrence = Recurrence(recurrence).rule if recurrence else None
+        next_due = schedule_next_due(due_date, recurrence, created_at)
         self.cursor.execute('''
-            INSERT INTO tasks (title, category, due_date, created_at, is_daily)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, category, due_date, created_at, is_daily))
+            INSERT INTO tasks (title, category, due_date, created_at, is_daily, recurrence, next_due)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (title, category, due_date, created_at, int(bool(recurrence)), recurrence, next_due))
         self.conn.commit()
+        return self._change(self.cursor.lastrowid, None)
+
+    def task_cursor(self):
+        """A new cursor that returns Task records."""
+        cursor = self.conn.cursor()
+        cursor.row_factory = Task.row_factory
+        return cursor
+
+    def iter_tasks(self, query, params=(), chunk_size=FETCH_CHUNK_SIZE):
+        """Yield the Task records of a query, fetching chunk_size rows at a time."""
+        cursor = self.task_cursor()
+        cursor.execute(query, params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield from chunk
+
+    def get_task(self, task_id, fields=TASK_FIELDS):
+        """Retrieve a single task by id, or None if it does not exist."""
+        cursor = self.task_cursor()
+        cursor.execute(f"SELECT {', '.join(fields)} FROM tasks WHERE id = ?", (task_id,))
+        return cursor.fetchone()
+
+    def iter_open_tasks(self, is_daily=None, order_by="id", fields=LIST_FIELDS):
+        """Yield open tasks in order_by order, optionally only daily or non-daily ones."""
+        filters = "completed = 0"
+        params = []
+        if is_daily is not None:
+            filters += " AND is_daily = ?"
+            params.append(is_daily)
+        return self.iter_tasks(f"SELECT {', '.join(fields)} FROM tasks WHERE {filters} ORDER BY {order_by}", params)
 
-    def get_tasks(self, completed=0, is_daily=None):
+    def get_tasks(self, completed=0, is_daily=None, fields=TASK_FIELDS):
         """Retrieve tasks based on completion status or daily status."""
-        if is_daily is None:
-            self.cursor.execute("SELECT * FROM tasks WHERE completed = ?", (completed,))
+        filters = "completed = ?"
+        params = [completed]
+        if is_daily is not None:
+            filters += " AND is_daily = ?"
+            params.append(is_daily)
+        return list(self.iter_tasks(f"SELECT {', '.join(fields)} FROM tasks WHERE {filters}", params))
+
+    def get_upcoming_reminders(self, start_date, fields=("id", "title", "completed", "next_due")):
+        """Yield open tasks due on or after start_date, earliest first, from the next_due index."""
+        return self.iter_tasks(f"SELECT {', '.join(fields)} FROM tasks "
+                               "WHERE completed = 0 AND next_due >= ? ORDER BY next_due", (start_date,))
+
+    def get_completed_page(self, before=None, limit=COMPLETED_PAGE_SIZE, archived=False):
+        """Return up to limit completed tasks, newest first, older than the (completed_at, id) key before."""
+        table = "tasks_archive" if archived else "tasks"
+        columns = ", ".join(LIST_FIELDS)
+        cursor = self.task_cursor()
+        if before is None:
+            cursor.execute(f'''
+                SELECT {columns} FROM {table} WHERE completed = 1
+                ORDER BY completed_at DESC, id DESC LIMIT ?
+            ''', (limit,))
         else:
-            self.cursor.execute("SELECT * FROM tasks WHERE completed = ? AND is_daily = ?", (completed, is_daily))
-        return self.cursor.fetchall()
+            cursor.execute(f'''
+                SELECT {columns} FROM {table} WHERE completed = 1 AND (completed_at, id) < (?, ?)
+                ORDER BY completed_at DESC, id DESC LIMIT ?
+            ''', (*before, limit))
+        return cursor.fetchall()
+
+    def archive_completed_tasks(self, older_than_days=None):
+        """Move tasks completed more than older_than_days ago into tasks_archive.
 
-    def update_task(self, task_id, title=None, category=None, due_date=None, is_daily=None):
-        """Update task details."""
+        Defaults to the archive_after_days setting; 0 disables archiving.
+        Returns the number of tasks moved.
+        """
+        if older_than_days is None:
+            older_than_days = int(self.get_meta("archive_after_days", "30"))
+        if older_than_days <= 0:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        columns = TASK_COLUMNS
+        self.cursor.execute(f'''
+            INSERT OR REPLACE INTO tasks_archive ({columns})
+            SELECT {columns} FROM tasks WHERE completed = 1 AND completed_at < ?
+        ''', (cutoff,))
+        # Archiving is local housekeeping, not a deletion to sync
+        self.cursor.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('sync_applying', '1')")
+        self.cursor.execute("DELETE FROM tasks WHERE completed = 1 AND completed_at < ?", (cutoff,))
+        moved = self.cursor.rowcount
+        self.cursor.execute("DELETE FROM app_meta WHERE key = 'sync_applying'")
+        if moved:
+            self.cursor.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('archived_count', ?)",
+                                (str(int(self.get_meta("archived_count", "0")) + moved),))
+        self.conn.commit()
+        return moved
+
+    def changes_since(self, seq, exclude_origin=None):
+        """Return ([uid, field, value, modified_at, origin] rows logged after seq, last seq in the log).
+
+        Rows that originated at exclude_origin, normally the peer being synced with, are left out.
+        """
+        self.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+        last_seq = self.cursor.fetchone()[0]
+        self.cursor.execute('''
+            SELECT uid, field, value, modified_at, origin FROM change_log
+            WHERE seq > ? AND seq <= ? AND origin IS NOT ? ORDER BY seq
+        ''', (seq, last_seq, exclude_origin))
+        return [list(row) for row in self.cursor.fetchall()], last_seq
+
+    def apply_changes(self, changes):
+        """Apply remote change rows, keeping for each field the newest write. Returns the number applied.
+
+        Writes are ordered by (modified_at, origin). A deletion wins over any
+        edit of the same task. Tasks that were archived here are updated in
+        the archive. A task new here is created when its title arrives, from
+        the newest value logged for each field; until then, changes to it are
+        only logged. All of it commits in one transaction.
+        """
+        applied = 0
+        try:
+            self.cursor.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('sync_applying', '1')")
+            for uid, field, value, modified_at, origin in changes:
+                if field != "deleted" and field not in SYNC_FIELDS:
+                    continue
+                self.cursor.execute('''
+                    SELECT field, modified_at, origin FROM change_log
+                    WHERE uid = ? AND field IN (?, 'deleted') ORDER BY field = 'deleted' DESC, seq DESC LIMIT 1
+                ''', (uid, field))
+                current = self.cursor.fetchone()
+                if current is not None and (current[0] == "deleted" or tuple(current[1:]) >= (modified_at, origin)):
+                    continue
+                if field == "deleted":
+                    self.cursor.execute("DELETE FROM tasks WHERE uid = ?", (uid,))
+                    self.cursor.execute("DELETE FROM tasks_archive WHERE uid = ?", (uid,))
+                else:
+                    self.cursor.execute(f"UPDATE tasks SET {field} = ? WHERE uid = ?", (value, uid))
+                    if self.cursor.rowcount == 0:
+                        self.cursor.execute(f"UPDATE tasks_archive SET {field} = ? WHERE uid = ?", (value, uid))
+                    if self.cursor.rowcount == 0 and field == "title":
+                        # A peer that compacted its log may send a new task's other fields before the
+                        # title, or only some of them, so the row is built from all that is logged for it
+                        self.cursor.execute('''
+                            SELECT field, value FROM change_log WHERE seq IN (
+                                SELECT MAX(seq) FROM change_log WHERE uid = ? GROUP BY field
+                            )
+                        ''', (uid,))
+                        fields = {name: logged for name, logged in self.cursor.fetchall() if name in SYNC_FIELDS}
+                        fields["title"] = value
+                        self.cursor.execute(f"INSERT INTO tasks (uid, {', '.join(fields)}) "
+                                            f"VALUES (?{', ?' * len(fields)})", (uid, *fields.values()))
+                self.cursor.execute("INSERT INTO change_log (uid, field, value, modified_at, origin) "
+                                    "VALUES (?, ?, ?, ?, ?)", (uid, field, value, modified_at, origin))
+                applied += 1
+            self.cursor.execute("DELETE FROM app_meta WHERE key = 'sync_applying'")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return applied
+
+    def compact_change_log(self):
+        """Drop log rows superseded by a later write of the same field. Returns the number dropped.
+
+        Peers only ever need the newest value of each field, so this never
+        loses anything a sync would send.
+        """
+        self.cursor.execute('''
+            DELETE FROM change_log WHERE seq NOT IN (SELECT MAX(seq) FROM change_log GROUP BY uid, field)
+            OR (field != 'deleted' AND uid IN (SELECT uid FROM change_log WHERE field = 'deleted'))
+        ''')
+        dropped = self.cursor.rowcount
+        self.conn.commit()
+        return dropped
+
+    def sync_hello(self, peer):
+        """First step of a sync, answered by the passive side: our replica id and the last seq received from peer."""
+        return {"replica": self.replica_id, "received": int(self.get_meta(f"sync_received:{peer}", "0"))}
+
+    def answer_sync(self, message):
+        """Second step, answered by the passive side: apply the peer's changes and return ours."""
+        peer = message["replica"]
+        applied = self.apply_changes(message["changes"])
+        self.set_meta(f"sync_received:{peer}", str(message["last_seq"]))
+        changes, last_seq = self.changes_since(message["since"], exclude_origin=peer)
+        return {"replica": self.replica_id, "changes": changes, "last_seq": last_seq, "applied": applied}
+
+    def sync_with(self, endpoint):
+        """Exchange the changes made since the last sync with a peer endpoint.
+
+        Returns {"sent": rows, "received": rows, "applied": rows applied here}.
+        """
+        hello = endpoint.hello(self.replica_id)
+        peer = hello["replica"]
+        exclude_origin = peer
+        if peer == self.replica_id:
+            # The two files were copied from one another: this side takes a new id, and its changes
+            # logged under the shared one are sent as well
+            self.replica_id = uuid.uuid4().hex
+            self.set_meta("replica_id", self.replica_id)
+            exclude_origin = None
+        changes, last_seq = self.changes_since(hello["received"], exclude_origin=exclude_origin)
+        reply = endpoint.exchange({"replica": self.replica_id, "changes": changes, "last_seq": last_seq,
+                                   "since": int(self.get_meta(f"sync_received:{peer}", "0"))})
+        applied = self.apply_changes(reply["changes"])
+        self.set_meta(f"sync_received:{peer}", str(reply["last_seq"]))
+        return {"sent": len(changes), "received": len(reply["changes"]), "applied": applied}
+
+    def sync(self, address):
+        """Sync with another todo.db file, or with a sync server given as host:port."""
+        endpoint = open_sync_endpoint(address)
+        try:
+            return self.sync_with(endpoint)
+        finally:
+            endpoint.close()
+
+    def get_due_tasks(self, start_date, end_date, fields=LIST_FIELDS):
+        """Yield open tasks whose next due date falls in a date range, from one indexed range query."""
+        return self.iter_tasks(f"SELECT {', '.join(fields)} FROM tasks "
+                               "WHERE completed = 0 AND next_due BETWEEN ? AND ? ORDER BY next_due",
+                               (start_date, end_date))
+
+    def search_tasks(self, text, completed=0, category=None, limit=500, fields=LIST_FIELDS):
+        """Return tasks whose title matches a search, best matches first.
+
+        Bare words match as prefixes and "quoted text" as an exact phrase.
+        """
+        terms = re.findall(r'"[^"]*"|[^\s"]+', text)
+        if not terms:
+            return []
+        filters = "tasks.completed = ?"
+        params = [completed]
+        if category:
+            filters += " AND tasks.category = ?"
+            params.append(category)
+        columns = ", ".join(f"tasks.{field}" for field in fields)
+        cursor = self.task_cursor()
+        if not self.has_fts:
+            # Fallback: unindexed substring match on every term
+            for term in terms:
+                filters += " AND tasks.title LIKE ?"
+                params.append(f"%{term.strip(chr(34))}%")
+            cursor.execute(f"SELECT {columns} FROM tasks WHERE {filters} LIMIT ?", params + [limit])
+            return cursor.fetchall()
+        match = " ".join(
+            term if term.startswith('"') else '"' + term.replace('"', '') + '"*'
+            for term in terms if term != '""')
+        if not match:
+            return []
+        cursor.execute(f'''
+            SELECT {columns} FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid
+            WHERE tasks_fts MATCH ? AND {filters}
+            ORDER BY tasks_fts.rank LIMIT ?
+        ''', [match] + params + [limit])
+        return cursor.fetchall()
+
+    def export_tasks(self, path, fmt=None, progress=None, chunk_size=TRANSFER_CHUNK_SIZE):
+        """Stream every task in the hot table to a CSV, JSONL or iCalendar file.
+
+        progress(rows_done, percent) is called after each chunk. Returns the row count.
+        """
+        write = TASK_FORMATS[fmt or task_format_for_path(path)][1]
+        self.cursor.execute("SELECT COUNT(*) FROM tasks")
+        total = self.cursor.fetchone()[0]
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT id, {', '.join(TRANSFER_FIELDS)} FROM tasks ORDER BY id")
+        columns = ("id",) + TRANSFER_FIELDS
+        done = 0
+
+        def rows():
+            nonlocal done
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for row in chunk:
+                    yield dict(zip(columns, row))
+                done += len(chunk)
+                if progress:
+                    progress(done, done * 100 // max(total, 1))
+
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            write(f, rows())
+        return done
+
+    def import_tasks(self, path, fmt=None, progress=None, chunk_size=TRANSFER_CHUNK_SIZE):
+        """Stream tasks from a CSV, JSONL or iCalendar file into the tasks table.
+
+        Rows are inserted with executemany in chunks inside a single
+        transaction, so a failed import leaves the database unchanged.
+        progress(rows_done, percent) is called after each chunk. Returns the row count.
+        """
+        read = TASK_FORMATS[fmt or task_format_for_path(path)][0]
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        size = max(os.path.getsize(path), 1)
+        fields = TRANSFER_FIELDS + ("next_due",)
+        query = f"INSERT INTO tasks ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})"
+        done = 0
+        chunk = []
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            try:
+                for task in read(f):
+                    title = (task.get("title") or "").strip()
+                    if not title:
+                        continue
+                    completed = _flag(task.get("completed"))
+                    created_at = task.get("created_at") or now
+                    due_date = task.get("due_date") or None
+                    recurrence = task.get("recurrence") or ("FREQ=DAILY" if _flag(task.get("is_daily")) else None)
+                    recurrence = recurrence and Recurrence(recurrence).rule
+                    chunk.append((title, task.get("category") or None, due_date, int(bool(recurrence)), completed,
+                                  created_at, (task.get("completed_at") or created_at) if completed else None,
+                                  recurrence, schedule_next_due(due_date, recurrence, created_at)))
+                    if len(chunk) >= chunk_size:
+                        self.cursor.executemany(query, chunk)
+                        done += len(chunk)
+                        chunk = []
+                        if progress:
+                            progress(done, min(f.buffer.tell() * 100 // size, 99))
+                if chunk:
+                    self.cursor.executemany(query, chunk)
+                    done += len(chunk)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        if progress:
+            progress(done, 100)
+        return done
+
+    def get_stats(self):
+        """Return dashboard counts, overall and per category, from one grouped query."""
+        today = date.today()
+        week_end = (today + timedelta(days=6)).isoformat()
+        today = today.isoformat()
+        self.cursor.execute('''
+            SELECT category,
+                   SUM(completed = 0),
+                   SUM(completed = 0 AND is_daily = 1),
+                   SUM(completed = 1),
+                   SUM(completed = 0 AND is_daily = 0 AND next_due < ?),
+                   SUM(completed = 0 AND next_due = ?),
+                   SUM(completed = 0 AND next_due BETWEEN ? AND ?)
+            FROM tasks GROUP BY category
+        ''', (today, today, today, week_end))
+        keys = ("open", "daily", "completed", "overdue", "due_today", "due_this_week")
+        stats = dict.fromkeys(keys, 0)
+        stats["by_category"] = {}
+        for category, *counts in self.cursor.fetchall():
+            row = dict(zip(keys, counts))
+            stats["by_category"][category or "No Category"] = row
+            for key in keys:
+                stats[key] += row[key]
+        stats["archived"] = int(self.get_meta("archived_count", "0"))
+        return stats
+
+    def update_task(self, task_id, title=None, category=None, due_date=None, is_daily=None, recurrence=None):
+        """Update task details.
+
+        recurrence=None leaves the rule alone, "" removes it. Turning is_daily
+        on without a rule makes the task FREQ=DAILY; turning it off removes the rule.
+        """
+        old_task = self.get_task(task_id)
+        if old_task is None:
+            return self._change(task_id, old_task)
+        if is_daily is not None and recurrence is None:
+            recurrence = (old_task.recurrence or "FREQ=DAILY") if is_daily else ""
+        if recurrence is not None:
+            recurrence = Recurrence(recurrence).rule if recurrence else ""
+            is_daily = int(bool(recurrence))
         updates = []
         params = []
         if title:
@@ -76,21 +1103,52 @@ class Database:
         if is_daily is not None:
             updates.append("is_daily = ?")
             params.append(is_daily)
-        params.append(task_id)
-        query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
-        self.cursor.execute(query, params)
-        self.conn.commit()
+        if recurrence is not None or due_date:
+            new_rule = old_task.recurrence if recurrence is None else recurrence or None
+            done_on = old_task.daily_completed_date
+            done_today = done_on if done_on == date.today().isoformat() else None
+            updates += ["recurrence = ?", "next_due = ?"]
+            params += [new_rule, schedule_next_due(due_date or old_task.due_date, new_rule, old_task.created_at,
+                                                   done_today)]
+        if updates:
+            params.append(task_id)
+            query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
+            self.cursor.execute(query, params)
+            self.conn.commit()
+        return self._change(task_id, old_task)
 
     def mark_completed(self, task_id):
         """Mark a task as fully completed."""
-        self.cursor.execute("UPDATE tasks SET completed = 1 WHERE id = ?", (task_id,))
+        old_task = self.get_task(task_id)
+        completed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.cursor.execute("UPDATE tasks SET completed = 1, completed_at = ? WHERE id = ?", (completed_at, task_id))
         self.conn.commit()
+        return self._change(task_id, old_task)
 
     def mark_daily_completed(self, task_id):
-        """Mark a task as completed for today."""
+        """Mark a task as completed for today and record it in the completion history."""
+        old_task = self.get_task(task_id)
         today = date.today().strftime("%Y-%m-%d")
-        self.cursor.execute("UPDATE tasks SET daily_completed_date = ? WHERE id = ?", (today, task_id))
+        # Advance past today, or past the pending occurrence if it was completed early
+        next_due = old_task and schedule_next_due(old_task.due_date, old_task.recurrence, old_task.created_at,
+                                                  max(today, old_task.next_due or today))
+        self.cursor.execute("UPDATE tasks SET daily_completed_date = ?, next_due = ? WHERE id = ?",
+                            (today, next_due, task_id))
+        self.cursor.execute("INSERT OR IGNORE INTO task_completions (task_id, date, completed_at) VALUES (?, ?, ?)",
+                            (task_id, today, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
         self.conn.commit()
+        return self._change(task_id, old_task)
+
+    def clear_daily_completion(self, task_id):
+        """Undo today's completion of a daily task. Earlier days' history is left untouched."""
+        old_task = self.get_task(task_id)
+        today = date.today().strftime("%Y-%m-%d")
+        next_due = old_task and schedule_next_due(old_task.due_date, old_task.recurrence, old_task.created_at)
+        self.cursor.execute("UPDATE tasks SET daily_completed_date = NULL, next_due = ? WHERE id = ?",
+                            (next_due, task_id))
+        self.cursor.execute("DELETE FROM task_completions WHERE task_id = ? AND date = ?", (task_id, today))
+        self.conn.commit()
+        return self._change(task_id, old_task)
 
     def reset_daily_completion(self):
         """Reset daily completion for tasks where daily_completed_date is not today."""
@@ -98,82 +1156,680 @@ class Database:
         self.cursor.execute("UPDATE tasks SET daily_completed_date = NULL WHERE daily_completed_date != ? AND is_daily = 1", (today,))
         self.conn.commit()
 
+    def roll_daily_completion(self):
+        """Reset daily completion once per calendar day. Returns True if a reset ran."""
+        today = date.today().strftime("%Y-%m-%d")
+        if self.get_meta("last_daily_reset") == today:
+            return False
+        self.reset_daily_completion()
+        # Missed occurrences of recurring tasks roll forward to the next one from today
+        self.cursor.execute("SELECT id, due_date, recurrence, created_at FROM tasks "
+                            "WHERE completed = 0 AND next_due < ? AND recurrence IS NOT NULL", (today,))
+        self.cursor.executemany("UPDATE tasks SET next_due = ? WHERE id = ?", [
+            (schedule_next_due(due_date, recurrence, created_at), task_id)
+            for task_id, due_date, recurrence, created_at in self.cursor.fetchall()])
+        self.set_meta("last_daily_reset", today)
+        return True
+
+    def get_completion_streak(self, task_id):
+        """Count consecutive days, ending today or yesterday, on which a task was completed."""
+        expected = date.today()
+        self.cursor.execute("SELECT date FROM task_completions WHERE task_id = ? AND date <= ? ORDER BY date DESC",
+                            (task_id, expected.strftime("%Y-%m-%d")))
+        streak = 0
+        for (day,) in self.cursor:
+            day = date.fromisoformat(day)
+            if streak == 0 and day == expected - timedelta(days=1):
+                expected = day  # today not done yet, the streak may still run through yesterday
+            if day != expected:
+                break
+            streak += 1
+            expected -= timedelta(days=1)
+        return streak
+
+    def get_completion_counts(self, start_date, end_date):
+        """Return {date: number of daily completions} for a date range, e.g. for a heatmap."""
+        self.cursor.execute('''
+            SELECT date, COUNT(*) FROM task_completions
+            WHERE date BETWEEN ? AND ? GROUP BY date
+        ''', (start_date, end_date))
+        return dict(self.cursor.fetchall())
+
     def delete_task(self, task_id):
         """Delete a task."""
+        old_task = self.get_task(task_id)
         self.cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
         self.conn.commit()
+        return self._change(task_id, old_task)
+
+    def _change(self, task_id, old_task):
+        """Build the change event for a task after it has been written."""
+        return TaskChange.between(task_id, old_task, self.get_task(task_id))
+
+    def close(self):
+        """Close database connection; must run on the thread that opened it."""
+        if getattr(self, "conn", None) is not None:
+            self.conn.close()
+            self.conn = None
 
     def __del__(self):
         """Close database connection."""
-        self.conn.close()
+        self.close()
+
+# Sync endpoints
+class FileEndpoint:
+    """A sync peer that is another todo.db file, e.g. on a shared drive, opened directly."""
+    def __init__(self, path):
+        self.db = Database(path)
+
+    def hello(self, replica_id):
+        return self.db.sync_hello(replica_id)
+
+    def exchange(self, message):
+        return self.db.answer_sync(message)
+
+    def close(self):
+        self.db.close()
+
+class SocketEndpoint:
+    """A sync peer reached over TCP, talking JSON lines to serve_sync()."""
+    def __init__(self, host, port, timeout=30):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.stream = self.sock.makefile("rw", encoding="utf-8", newline="\n")
+
+    def request(self, message):
+        self.stream.write(json.dumps(message) + "\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("sync server closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            raise ConnectionError(f"sync server: {reply['error']}")
+        return reply
+
+    def hello(self, replica_id):
+        return self.request({"op": "hello", "replica": replica_id})
+
+    def exchange(self, message):
+        return self.request({"op": "exchange", **message})
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+def split_sync_address(address, default_host="localhost"):
+    """Parse "[host:]port" into (host, port)."""
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port)
+
+def open_sync_endpoint(address):
+    """A SocketEndpoint for "host:port" or a bare port, otherwise a FileEndpoint for a database path."""
+    if re.fullmatch(r"(?:[\w.-]+:)?\d+", address):
+        return SocketEndpoint(*split_sync_address(address))
+    return FileEndpoint(address)
+
+class SyncRequestHandler(socketserver.StreamRequestHandler):
+    """Answers one sync client; each connection gets its own Database."""
+    def handle(self):
+        db = Database(self.server.db_name)
+        try:
+            for line in self.rfile:
+                try:
+                    message = json.loads(line)
+                    if message.get("op") == "hello":
+                        reply = db.sync_hello(message["replica"])
+                    elif message.get("op") == "exchange":
+                        reply = db.answer_sync(message)
+                    else:
+                        reply = {"error": f"unknown op {message.get('op')!r}"}
+                except Exception as e:
+                    reply = {"error": str(e)}
+                self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+        finally:
+            db.close()
+
+def serve_sync(db_name="todo.db", address=str(DEFAULT_SYNC_PORT)):
+    """Serve sync requests for db_name until interrupted.
+
+    There is no authentication, so the host defaults to localhost; bind
+    another interface only on a network you trust.
+    """
+    with socketserver.TCPServer(split_sync_address(address), SyncRequestHandler) as server:
+        server.db_name = db_name
+        print(f"Serving sync for {db_name} on {address}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+# Background database access
+class DatabaseWorker(QThread):
+    """Runs Database methods on a dedicated thread that owns its own connection.
+
+    Requests are queued with submit() and executed in order; each result is
+    delivered back on the GUI thread to the request's callback, so the UI
+    never waits on SQLite I/O.
+    """
+    request_done = pyqtSignal(int, object, object)  # request id, result, exception
+    request_chunk = pyqtSignal(int, object)  # request id, list of rows from a streamed request
+    request_failed = pyqtSignal(str, object)  # method name, exception
+    progress = pyqtSignal(int, int)  # rows done, percent; pass progress=worker.progress.emit to long requests
+
+    def __init__(self, db_name="todo.db", parent=None, database_class=None, instrumentation=None):
+        super().__init__(parent)
+        self.db_name = db_name
+        self.database_class = database_class or Database
+        self.instrumentation = instrumentation
+        self.requests = queue.Queue()
+        self.pending = {}  # request id -> (method name, callback, errback, chunk callback)
+        self.next_request_id = 0
+        self.request_done.connect(self.deliver)
+        self.request_chunk.connect(self.deliver_chunk)
+
+    def submit(self, method, *args, callback=None, errback=None, chunk_callback=None, **kwargs):
+        """Queue a call to Database.<method>.
+
+        callback receives its return value; errback, if given, receives the
+        exception instead of it being reported through request_failed.
+        With chunk_callback the method's result is iterated on the worker
+        thread and handed over FETCH_CHUNK_SIZE rows at a time; callback
+        then receives the row count.
+        """
+        self.next_request_id += 1
+        self.pending[self.next_request_id] = (method, callback, errback, chunk_callback)
+        self.requests.put((self.next_request_id, method, args, kwargs, chunk_callback is not None))
+        return self.next_request_id
+
+    def run(self):
+        """Worker thread loop: execute queued requests until stop() is called."""
+        db = self.database_class(self.db_name)
+        if self.instrumentation is not None:
+            self.instrumentation.wrap(db, [name for name in dir(Database)
+                                           if not name.startswith("_") and callable(getattr(Database, name))], "db.")
+        try:
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    break
+                request_id, method, args, kwargs, streamed = request
+                try:
+                    result = getattr(db, method)(*args, **kwargs)
+                    if streamed:
+                        result = self.stream(request_id, iter(result))
+                    self.request_done.emit(request_id, result, None)
+                except Exception as e:
+                    self.request_done.emit(request_id, None, e)
+        finally:
+            db.close()
+
+    def stream(self, request_id, rows):
+        """Emit rows in chunks so neither thread holds the whole result; returns the row count."""
+        count = 0
+        while True:
+            chunk = list(islice(rows, FETCH_CHUNK_SIZE))
+            if not chunk:
+                return count
+            count += len(chunk)
+            self.request_chunk.emit(request_id, chunk)
+
+    def deliver_chunk(self, request_id, rows):
+        """Hand one chunk of a streamed result to its chunk callback (runs on the GUI thread)."""
+        self.pending[request_id][3](rows)
+
+    def deliver(self, request_id, result, error):
+        """Hand a finished request's result to its callback (runs on the GUI thread)."""
+        method, callback, errback, chunk_callback = self.pending.pop(request_id)
+        if error is not None:
+            if errback is not None:
+                errback(error)
+            else:
+                self.request_failed.emit(method, error)
+        elif callback is not None:
+            callback(result)
+
+    def stop(self):
+        """Finish the queued requests, then close the connection and end the thread."""
+        self.requests.put(None)
+        self.wait()
+
+# Day rollover timer
+class DailyResetScheduler(QObject):
+    """Emits day_changed once at each local midnight instead of polling."""
+    day_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.current_day = date.today()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.VeryCoarseTimer)
+        self.timer.timeout.connect(self.check_rollover)
+
+    def start(self):
+        """Arm the timer for the next local midnight."""
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+        # A second of slack so the timer never fires just before midnight
+        self.timer.start(int((midnight - now).total_seconds() * 1000) + 1000)
+
+    def check_rollover(self):
+        """Emit day_changed if the date moved on, then re-arm for the next midnight."""
+        if date.today() != self.current_day:
+            self.current_day = date.today()
+            self.day_changed.emit()
+        self.start()
+
+# Due date reminders
+class ReminderScheduler(QObject):
+    """Emits reminders_due when open tasks reach their reminder time.
+
+    Upcoming reminders sit in a min-heap of (time, task id, version) with a
+    single timer armed for the earliest one. A changed task gets a new
+    version instead of being searched for in the heap; outdated entries are
+    dropped when they reach the top.
+    """
+    reminders_due = pyqtSignal(list)  # Task records
+    MAX_WAIT_MS = 24 * 60 * 60 * 1000  # wake at least daily so clock changes are noticed
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.heap = []
+        self.live = {}  # task id -> (version, task) of its pending reminder
+        self.version = 0
+        self.shown_through = datetime.min  # reminders up to here were already shown
+        self.shown = {}  # task id -> time of the reminder shown for it since the last reset
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.VeryCoarseTimer)
+        self.timer.timeout.connect(self.fire)
+
+    @staticmethod
+    def remind_at(task):
+        """When to remind about a task, or None if it has nothing upcoming."""
+        if task is None or task.completed or not task.next_due:
+            return None
+        return datetime.combine(date.fromisoformat(task.next_due), REMINDER_TIME)
+
+    def reset(self, shown_through=""):
+        """Forget every reminder; shown_through is the ISO time of the last one shown."""
+        self.heap = []
+        self.live = {}
+        self.shown = {}
+        self.shown_through = datetime.fromisoformat(shown_through) if shown_through else datetime.min
+        self.timer.stop()
+
+    def add(self, tasks):
+        """Schedule a batch of tasks, e.g. one streamed chunk, and re-arm once."""
+        for task in tasks:
+            self._push(task)
+        self.arm()
+
+    def update(self, task_id, task):
+        """Reschedule a task after a change; None or a completed task cancels its reminder.
+
+        A task moved to a reminder time that has already passed is reminded
+        about at once, unless that exact reminder was shown before.
+        """
+        self.live.pop(task_id, None)
+        self._push(task, catch_up=True)
+        self.arm()
+
+    def _push(self, task, catch_up=False):
+        when = self.remind_at(task)
+        if when is None or (when <= self.shown_through and (not catch_up or self.shown.get(task.id) == when)):
+            return
+        self.version += 1
+        self.live[task.id] = (self.version, task)
+        heapq.heappush(self.heap, (when, task.id, self.version))
+        if len(self.heap) > 2 * len(self.live) + 64:
+            # Mostly outdated entries: rebuild rather than let the heap grow with every edit
+            self.heap = [entry for entry in self.heap if self._is_live(entry)]
+            heapq.heapify(self.heap)
+
+    def _is_live(self, entry):
+        return self.live.get(entry[1], (None,))[0] == entry[2]
+
+    def _drop_outdated(self):
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+
+    def arm(self):
+        """Point the timer at the earliest pending reminder."""
+        self._drop_outdated()
+        if not self.heap:
+            self.timer.stop()
+            return
+        wait = (self.heap[0][0] - datetime.now()).total_seconds() * 1000
+        self.timer.start(int(min(max(wait, 0), self.MAX_WAIT_MS)))
+
+    def fire(self):
+        """Emit every reminder that is due, then re-arm for the next one."""
+        now = datetime.now()
+        due = []
+        self._drop_outdated()
+        while self.heap and self.heap[0][0] <= now:
+            when, task_id, version = heapq.heappop(self.heap)
+            due.append(self.live.pop(task_id)[1])
+            self.shown[task_id] = when
+            self._drop_outdated()
+        if due:
+            self.shown_through = max(self.shown_through, now)
+            self.reminders_due.emit(due)
+        self.arm()
 
 # Custom Task Widget
 class TaskItem(QWidget):
-    def __init__(self, task, parent=None, show_daily_checkbox=False):
+    def __init__(self, task, parent=None, show_daily_checkbox=False, read_only=False):
         super().__init__(parent)
         self.task = task
-        self.task_id, title, category, due_date, completed, created_at, is_daily, daily_completed_date = task
+        self.task_id = task.id
         self.parent_widget = parent
         layout = QHBoxLayout()
 
         # Checkbox for marking task as fully completed
-        self.checkbox = QCheckBox(title)
-        self.checkbox.setChecked(bool(completed))
+        self.checkbox = QCheckBox(task.title)
+        self.checkbox.setChecked(bool(task.completed))
+        self.checkbox.setEnabled(not read_only)
         layout.addWidget(self.checkbox)
 
-        # Daily completion checkbox (only shown in Daily Tasks tab)
-        if show_daily_checkbox and is_daily:
+        # Daily completion checkbox (only shown in Recurring Tasks tab)
+        if show_daily_checkbox and task.is_daily:
             today = date.today().strftime("%Y-%m-%d")
             self.daily_checkbox = QCheckBox("Done Today")
-            self.daily_checkbox.setChecked(daily_completed_date == today)
+            self.daily_checkbox.setChecked(task.daily_completed_date == today)
             layout.addWidget(self.daily_checkbox)
             self.daily_checkbox.stateChanged.connect(self.toggle_daily_completion)
 
         # Labels for category and due date
-        category_label = QLabel(category or "No Category")
-        due_label = QLabel(due_date or "No Due Date")
+        category_label = QLabel(task.category or "No Category")
+        if task.recurrence:
+            due_label = QLabel(f"{Recurrence(task.recurrence).describe()}, next {task.next_due}")
+        else:
+            due_label = QLabel(task.due_date or "No Due Date")
         layout.addWidget(category_label)
         layout.addWidget(due_label)
 
         # Edit and Delete buttons
-        edit_btn = QPushButton("Edit")
-        edit_btn.setFixedWidth(60)
-        edit_btn.clicked.connect(self.edit_task)
-        delete_btn = QPushButton("Delete")
-        delete_btn.setFixedWidth(60)
-        delete_btn.clicked.connect(self.delete_task)
-        layout.addWidget(edit_btn)
-        layout.addWidget(delete_btn)
+        if not read_only:
+            edit_btn = QPushButton("Edit")
+            edit_btn.setFixedWidth(60)
+            edit_btn.clicked.connect(self.edit_task)
+            delete_btn = QPushButton("Delete")
+            delete_btn.setFixedWidth(60)
+            delete_btn.clicked.connect(self.delete_task)
+            layout.addWidget(edit_btn)
+            layout.addWidget(delete_btn)
 
         self.setLayout(layout)
 
     def toggle_daily_completion(self):
         """Toggle daily completion status."""
-        if self.daily_checkbox.isChecked():
-            self.parent_widget.db.mark_daily_completed(self.task_id)
-        else:
-            self.parent_widget.db.cursor.execute("UPDATE tasks SET daily_completed_date = NULL WHERE id = ?", (self.task_id,))
-            self.parent_widget.db.conn.commit()
-        self.parent_widget.refresh_daily_tasks()
+        self.parent_widget.set_daily_completed(self.task_id, self.daily_checkbox.isChecked())
 
     def edit_task(self):
         """Open dialog to edit task."""
         dialog = TaskDialog(self.task, self.parent_widget)
         if dialog.exec_():
-            title, category, due_date, is_daily = dialog.get_data()
-            self.parent_widget.db.update_task(self.task_id, title, category, due_date, is_daily)
-            self.parent_widget.refresh_all()
+            title, category, due_date, recurrence = dialog.get_data()
+            self.parent_widget.update_task(self.task_id, title, category, due_date, recurrence)
 
     def delete_task(self):
         """Delete task with confirmation."""
         reply = QMessageBox.question(self, "Delete Task", "Are you sure you want to delete this task?",
     QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.parent_widget.db.delete_task(self.task_id)
-            self.parent_widget.refresh_all()
+            self.parent_widget.delete_task(self.task_id)
+
+# Incrementally maintained task list
+class TaskListView:
+    """Keeps a QListWidget in step with the tasks accepted by a predicate.
+
+    Rows are patched one at a time from TaskChange events instead of
+    rebuilding the whole list on every mutation.
+    """
+    def __init__(self, app, list_widget, accepts, show_daily_checkbox=False, completable=True, read_only=False):
+        self.app = app
+        self.list_widget = list_widget
+        self.accepts = accepts
+        self.show_daily_checkbox = show_daily_checkbox
+        self.completable = completable
+        self.read_only = read_only
+        self.sort_key = self.default_sort_key
+        self.keys = []  # sorted (sort key, task id) pairs, one per list row
+        self.entries = {}  # task id -> its pair in self.keys
+        if app.instrumentation is not None:
+            app.instrumentation.wrap(self, ("reload", "extend", "apply"), type(self).__name__ + ".",
+                                     Instrumentation.count_input_rows)
+
+    @staticmethod
+    def default_sort_key(task):
+        """Order rows by insertion, i.e. by task id."""
+        return task.id
+
+    def reload(self, tasks, sort_key=None):
+        """Replace the whole list with the given tasks, optionally changing the order."""
+        if sort_key is not None:
+            self.sort_key = sort_key
+        with self.batch():
+            self.list_widget.clear()
+            self.keys = []
+            self.entries = {}
+            self.extend(tasks)
+
+    def extend(self, tasks):
+        """Add a batch of tasks, e.g. one chunk of a streamed query, keeping the list sorted."""
+        with self.batch():
+            for task in sorted((t for t in tasks if self.accepts(t)), key=self.sort_key):
+                if task.id in self.entries:
+                    continue
+                entry = (self.sort_key(task), task.id)
+                if self.keys and entry < self.keys[-1]:
+                    self._insert(task)
+                    continue
+                self.entries[task.id] = entry
+                self.keys.append(entry)
+                self._add_widget(QListWidgetItem(self.list_widget), task)
+
+    @contextmanager
+    def batch(self):
+        """Hide a visible list while rows are added in bulk.
+
+        Row widgets added to a shown list are laid out one by one, which
+        grows quadratically; a hidden list lays them all out once when it
+        is shown again. No paint happens in between, so nothing flickers.
+        """
+        visible = self.list_widget.isVisible()
+        if visible:
+            self.list_widget.hide()
+        try:
+            yield
+        finally:
+            if visible:
+                self.list_widget.show()
+
+    def stream(self, method, *args, sort_key=None, current=lambda: True, **kwargs):
+        """Reload from a Database method whose rows arrive in chunks, ideally already in sort order.
+
+        The list is replaced when the first chunk arrives, so it never
+        sits empty while the query runs. Chunks are ignored once current() is false.
+        """
+        fresh = True
+
+        def add(tasks):
+            nonlocal fresh
+            if not current():
+                return
+            if fresh:
+                fresh = False
+                self.reload(tasks, sort_key)
+            else:
+                self.extend(tasks)
+
+        def done(count):
+            if fresh and current():
+                self.reload([], sort_key)
+
+        self.app.db.submit(method, *args, chunk_callback=add, callback=done, **kwargs)
+
+    def apply(self, change):
+        """Patch only the row affected by a change event."""
+        task = change.task
+        wanted = task is not None and self.wants(task)
+        old_entry = self.entries.get(change.task_id)
+        if old_entry is None:
+            if wanted:
+                self._insert(task)
+        elif not wanted:
+            self._remove(change.task_id)
+        elif old_entry == (self.sort_key(task), task.id):
+            self._add_widget(self.list_widget.item(bisect_left(self.keys, old_entry)), task)
+        else:
+            self._remove(change.task_id)
+            self._insert(task)
+
+    def wants(self, task):
+        """Whether a changed task should have a row in this view."""
+        return self.accepts(task)
+
+    def _insert(self, task):
+        entry = (self.sort_key(task), task.id)
+        row = bisect_left(self.keys, entry)
+        self.keys.insert(row, entry)
+        self.entries[task.id] = entry
+        item = QListWidgetItem()
+        self.list_widget.insertItem(row, item)
+        self._add_widget(item, task)
+
+    def _remove(self, task_id):
+        entry = self.entries.pop(task_id)
+        row = bisect_left(self.keys, entry)
+        del self.keys[row]
+        self.list_widget.takeItem(row)
+
+    def _add_widget(self, item, task):
+        task_widget = TaskItem(task, self.app, show_daily_checkbox=self.show_daily_checkbox, read_only=self.read_only)
+        item.setSizeHint(task_widget.sizeHint())
+        self.list_widget.setItemWidget(item, task_widget)
+        if self.completable:
+            task_widget.checkbox.stateChanged.connect(
+                lambda state, task_id=task.id: self.app.mark_task_completed(task_id))
+
+class Descending:
+    """Sort key wrapper that reverses the natural order of its value."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+# Completed task list loaded page by page
+class PagedTaskListView(TaskListView):
+    """A TaskListView over completed tasks that fetches keyset pages as the user scrolls.
+
+    Rows are ordered newest completion first. Only rows newer than the last
+    loaded key are patched in from change events; older ones arrive with
+    their page.
+    """
+    def __init__(self, app, list_widget, archived=False, page_size=COMPLETED_PAGE_SIZE):
+        super().__init__(app, list_widget, lambda t: t.completed == 1, completable=False, read_only=archived)
+        self.archived = archived
+        self.page_size = page_size
+        self.sort_key = lambda task: Descending((task.completed_at or "", task.id))
+        self.last_key = None  # (completed_at, id) of the oldest loaded row
+        self.exhausted = False
+        self.loading = False
+        self.generation = 0  # bumped on reset so in-flight pages are dropped
+        scroll_bar = list_widget.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self.load_if_near_end)
+        scroll_bar.rangeChanged.connect(self.load_if_near_end)
+
+    def wants(self, task):
+        """Completed, and inside the window of pages loaded so far."""
+        if not self.accepts(task):
+            return False
+        return self.exhausted or self.last_key is None or (task.completed_at or "", task.id) > self.last_key
+
+    def reset(self):
+        """Drop all rows and load the first page again."""
+        self.generation += 1
+        self.reload([])
+        self.last_key = None
+        self.exhausted = False
+        self.loading = False
+        self.load_more()
+
+    def load_if_near_end(self, *args):
+        """Fetch the next page when the list is scrolled close to its end or not yet full."""
+        scroll_bar = self.list_widget.verticalScrollBar()
+        if scroll_bar.value() >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self.load_more()
+
+    def load_more(self):
+        """Request the page after the oldest loaded row."""
+        if self.loading or self.exhausted:
+            return
+        self.loading = True
+        generation = self.generation
+        self.app.db.submit("get_completed_page", self.last_key, self.page_size, self.archived,
+                           callback=lambda tasks: self.append_page(generation, tasks))
+
+    def append_page(self, generation, tasks):
+        """Append a fetched page below the loaded rows."""
+        if generation != self.generation:
+            return
+        self.extend(tasks)
+        if tasks:
+            self.last_key = (tasks[-1].completed_at or "", tasks[-1].id)
+        self.exhausted = len(tasks) < self.page_size
+        self.loading = False
+        self.list_widget.doItemsLayout()  # update the scroll range now rather than on the next paint
+        self.load_if_near_end()
+
+# Instrumentation panel
+class InstrumentationDialog(QDialog):
+    """Shows the instrumentation counters, with reset and JSON export."""
+    def __init__(self, instrumentation, parent=None):
+        super().__init__(parent)
+        self.instrumentation = instrumentation
+        self.setWindowTitle("Performance Stats")
+        self.resize(760, 480)
+        layout = QVBoxLayout()
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont("Consolas", 9))
+        layout.addWidget(self.text)
+        buttons = QHBoxLayout()
+        for label, slot in (("Refresh", self.show_stats), ("Reset", self.reset), ("Save JSON...", self.save)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.show_stats()
+
+    def show_stats(self):
+        self.text.setPlainText(f"Slow-operation threshold: {self.instrumentation.slow_ms} ms\n\n"
+                               + self.instrumentation.report())
+
+    def reset(self):
+        self.instrumentation.reset()
+        self.show_stats()
+
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Stats", "todo_stats.json", "JSON (*.json)")
+        if path:
+            self.instrumentation.dump(path)
 
 # Task Dialog for Adding/Editing Tasks
 class TaskDialog(QDialog):
+    REPEAT_CHOICES = ("Does not repeat", "Daily", "Weekdays", "Weekly", "Monthly")
+
     def __init__(self, task=None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Add/Edit Task")
@@ -188,16 +1844,16 @@ class TaskDialog(QDialog):
         self.due_date = QDateEdit()
         self.due_date.setCalendarPopup(True)
         self.due_date.setDate(QDate.currentDate())
-        self.is_daily = QCheckBox("Daily Task")
+        self.repeat_combo = QComboBox()
+        self.repeat_combo.addItems(self.REPEAT_CHOICES)
 
         # Set existing task data if editing
         if task:
-            task_id, title, category, due_date, completed, created_at, is_daily, daily_completed_date = task
-            self.title_input.setText(title)
-            self.category_combo.setCurrentText(category or "Other")
-            if due_date:
-                self.due_date.setDate(QDate.fromString(due_date, "yyyy-MM-dd"))
-            self.is_daily.setChecked(bool(is_daily))
+            self.title_input.setText(task.title)
+            self.category_combo.setCurrentText(task.category or "Other")
+            if task.due_date:
+                self.due_date.setDate(QDate.fromString(task.due_date, "yyyy-MM-dd"))
+            self.set_recurrence(task.recurrence or ("FREQ=DAILY" if task.is_daily else None))
 
         # Buttons
         save_btn = QPushButton("Save")
@@ -208,28 +1864,83 @@ class TaskDialog(QDialog):
         layout.addWidget(self.category_combo)
         layout.addWidget(QLabel("Due Date:"))
         layout.addWidget(self.due_date)
-        layout.addWidget(self.is_daily)
+        layout.addWidget(QLabel("Repeat:"))
+        layout.addWidget(self.repeat_combo)
         layout.addWidget(save_btn)
 
         self.setLayout(layout)
 
+    def set_recurrence(self, rule):
+        """Select the repeat choice matching an existing rule, adding a Custom entry if none does."""
+        if not rule:
+            return
+        recurrence = Recurrence(rule)
+        for choice in self.REPEAT_CHOICES[1:]:
+            if self.rule_for(choice) == recurrence.rule:
+                self.repeat_combo.setCurrentText(choice)
+                return
+        self.repeat_combo.addItem(f"Custom: {recurrence.describe()}", recurrence.rule)
+        self.repeat_combo.setCurrentIndex(self.repeat_combo.count() - 1)
+
+    def rule_for(self, choice):
+        """RRULE for a repeat choice, anchored on the selected due date."""
+        due = self.due_date.date().toPyDate()
+        return {
+            "Daily": "FREQ=DAILY",
+            "Weekdays": "FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR",
+            "Weekly": f"FREQ=WEEKLY;BYDAY={Recurrence.WEEKDAYS[due.weekday()]}",
+            "Monthly": f"FREQ=MONTHLY;BYMONTHDAY={due.day}",
+        }.get(choice, "")
+
     def get_data(self):
-        """Return task data."""
+        """Return task data; the recurrence is an RRULE or "" for one-off tasks."""
+        recurrence = self.repeat_combo.currentData() or self.rule_for(self.repeat_combo.currentText())
         return (self.title_input.text(), self.category_combo.currentText(),
-                self.due_date.date().toString("yyyy-MM-dd"), self.is_daily.isChecked())
+                self.due_date.date().toString("yyyy-MM-dd"), recurrence)
 
 # Main Application Window
 class ToDoApp(QMainWindow):
-    def __init__(self):
+    task_changed = pyqtSignal(object)  # TaskChange
+
+    def __init__(self, db_name="todo.db", database_class=None, instrumentation=None):
         super().__init__()
         self.setWindowTitle("To-Do List App")
         self.setGeometry(100, 100, 800, 600)
         self.setWindowIcon(QIcon("assets/icon.png"))  # Assumed icon path
-        self.db = Database()
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.wrap(self, [name for name in dir(ToDoApp) if name.startswith("refresh_")]
+                                 + ["update_home_stats", "show_home_stats", "show_tasks", "reload_reminders"], "app.")
+        self.db = DatabaseWorker(db_name, self, database_class, instrumentation)
+        if instrumentation is not None:
+            instrumentation.watch_worker(self.db)
+        self.db.request_failed.connect(self.show_db_error)
+        self.db.start()
         self.theme = "light"
+        self.loaded = False  # set once the first paint has queued the startup queries
         self.init_ui()
         self.apply_stylesheet()
-        self.db.reset_daily_completion()  # Reset daily tasks on app start
+        self.task_changed.connect(self.apply_change)
+        self.daily_reset = DailyResetScheduler(self)
+        self.daily_reset.day_changed.connect(self.start_new_day)
+        self.daily_reset.start()
+        self.reminders = ReminderScheduler(self)
+        self.reminders.reminders_due.connect(self.show_reminders)
+        self.tray_icon = None  # created for the first reminder if the desktop has a tray
+
+    def showEvent(self, event):
+        """Queue the startup database work behind the first paint."""
+        super().showEvent(event)
+        if not self.loaded:
+            self.loaded = True
+            QTimer.singleShot(0, self.load_initial_data)
+
+    def load_initial_data(self):
+        """Roll the day over, archive old completions, then fill the tabs built so far."""
+        self.db.submit("roll_daily_completion")  # Reset daily tasks if the day changed since last run
+        self.db.submit("archive_completed_tasks")
+        self.db.submit("compact_change_log")
+        self.refresh_all()
 
     def init_ui(self):
         """Initialize the UI with tabs."""
@@ -246,30 +1957,55 @@ class ToDoApp(QMainWindow):
         # Add tabs
         self.tabs.addTab(self.home_tab, "Home")
         self.tabs.addTab(self.task_tab, "Tasks")
-        self.tabs.addTab(self.daily_tab, "Daily Tasks")
+        self.tabs.addTab(self.daily_tab, "Recurring Tasks")
         self.tabs.addTab(self.completed_tab, "Completed")
         self.tabs.addTab(self.settings_tab, "Settings")
 
-        self.init_home_tab()
-        self.init_task_tab()
-        self.init_daily_tab()
-        self.init_completed_tab()
-        self.init_settings_tab()
+        # Tabs are built, and their lists loaded, the first time they are shown
+        self.task_view = None
+        self.daily_view = None
+        self.completed_view = None
+        self.archive_view = None
+        self.search_ids = None  # ranked ids of the active search, or None when not searching
+        self.task_query = 0  # bumped per Tasks tab query so stale results are ignored
+        self.tab_builders = {
+            self.home_tab: self.init_home_tab,
+            self.task_tab: self.init_task_tab,
+            self.daily_tab: self.init_daily_tab,
+            self.completed_tab: self.init_completed_tab,
+            self.settings_tab: self.init_settings_tab,
+        }
+        self.build_tab(self.tabs.currentIndex())
+        self.tabs.currentChanged.connect(self.build_tab)
 
         # Animation for tab switching
         self.tabs.currentChanged.connect(self.animate_tab_switch)
 
+    def build_tab(self, index):
+        """Construct a tab on its first activation."""
+        builder = self.tab_builders.pop(self.tabs.widget(index), None)
+        if builder is not None:
+            builder()
+
     def init_home_tab(self):
         """Initialize Home/Dashboard tab."""
         layout = QVBoxLayout()
         layout.setAlignment(Qt.AlignCenter)
         title = QLabel("Welcome to Your To-Do App!")
         title.setFont(QFont("Segoe UI", 20, QFont.Bold))
-        stats = QLabel(f"Tasks: {len(self.db.get_tasks(0))} | Daily: {len(self.db.get_tasks(is_daily=1))} | Completed: {len(self.db.get_tasks(1))}")
-        stats.setFont(QFont("Segoe UI", 14))
+        self.stats_label = QLabel()
+        self.stats_label.setFont(QFont("Segoe UI", 14))
+        self.due_stats_label = QLabel()
+        self.due_stats_label.setFont(QFont("Segoe UI", 12))
+        self.category_stats_label = QLabel()
+        self.category_stats_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(title)
-        layout.addWidget(stats)
+        layout.addWidget(self.stats_label)
+        layout.addWidget(self.due_stats_label)
+        layout.addWidget(self.category_stats_label)
         self.home_tab.setLayout(layout)
+        if self.loaded:
+            self.update_home_stats()
 
     def init_task_tab(self):
         """Initialize Task List tab."""
@@ -287,32 +2023,60 @@ class ToDoApp(QMainWindow):
         self.filter_combo.currentTextChanged.connect(self.refresh_tasks)
         sort_btn = QPushButton("Sort by Due Date")
         sort_btn.clicked.connect(self.sort_tasks)
+        self.due_filter_combo = QComboBox()
+        self.due_filter_combo.addItems(["Any Time", "Due Today", "Due This Week"])
+        self.due_filter_combo.currentTextChanged.connect(self.refresh_tasks)
         filter_layout.addWidget(QLabel("Filter by Category:"))
         filter_layout.addWidget(self.filter_combo)
+        filter_layout.addWidget(self.due_filter_combo)
         filter_layout.addWidget(sort_btn)
         layout.addLayout(filter_layout)
 
+        # Search box, debounced so typing doesn't queue a query per keystroke
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('Search tasks (prefix words, "exact phrase")')
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.refresh_tasks)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        layout.addWidget(self.search_input)
+
         # Task list
         self.task_list = QListWidget()
         layout.addWidget(self.task_list)
         self.task_tab.setLayout(layout)
-        self.refresh_tasks()
+        self.task_view = TaskListView(self, self.task_list, self.accepts_open_task)
+        if self.loaded:
+            self.refresh_tasks()
 
     def init_daily_tab(self):
-        """Initialize Daily Tasks tab."""
+        """Initialize Recurring Tasks tab."""
         layout = QVBoxLayout()
         self.daily_list = QListWidget()
         layout.addWidget(self.daily_list)
         self.daily_tab.setLayout(layout)
-        self.refresh_daily_tasks()
+        self.daily_view = TaskListView(self, self.daily_list, lambda t: t.completed == 0 and t.is_daily == 1,
+                                       show_daily_checkbox=True)
+        if self.loaded:
+            self.refresh_daily_tasks()
 
     def init_completed_tab(self):
         """Initialize Completed Tasks tab."""
         layout = QVBoxLayout()
+        self.archive_btn = QPushButton("Show Archive")
+        self.archive_btn.setCheckable(True)
+        self.archive_btn.toggled.connect(self.toggle_archive)
+        layout.addWidget(self.archive_btn)
         self.completed_list = QListWidget()
         layout.addWidget(self.completed_list)
+        self.archive_list = QListWidget()
+        self.archive_list.hide()
+        layout.addWidget(self.archive_list)
         self.completed_tab.setLayout(layout)
-        self.refresh_completed_tasks()
+        self.completed_view = PagedTaskListView(self, self.completed_list)
+        if self.loaded:
+            self.refresh_completed_tasks()
 
     def init_settings_tab(self):
         """Initialize Settings tab."""
@@ -320,86 +2084,316 @@ class ToDoApp(QMainWindow):
         theme_btn = QPushButton("Toggle Theme")
         theme_btn.clicked.connect(self.toggle_theme)
         layout.addWidget(theme_btn)
+        archive_layout = QHBoxLayout()
+        archive_layout.addWidget(QLabel("Archive completed tasks after (days, 0 = never):"))
+        self.archive_days = QSpinBox()
+        self.archive_days.setRange(0, 3650)
+        self.archive_days.editingFinished.connect(self.set_archive_age)
+        archive_layout.addWidget(self.archive_days)
+        layout.addLayout(archive_layout)
+        transfer_layout = QHBoxLayout()
+        import_btn = QPushButton("Import Tasks...")
+        import_btn.clicked.connect(self.import_tasks)
+        export_btn = QPushButton("Export Tasks...")
+        export_btn.clicked.connect(self.export_tasks)
+        transfer_layout.addWidget(import_btn)
+        transfer_layout.addWidget(export_btn)
+        layout.addLayout(transfer_layout)
+        sync_layout = QHBoxLayout()
+        sync_file_btn = QPushButton("Sync with Database File...")
+        sync_file_btn.clicked.connect(self.sync_with_file)
+        sync_server_btn = QPushButton("Sync with Server...")
+        sync_server_btn.clicked.connect(self.sync_with_server)
+        sync_layout.addWidget(sync_file_btn)
+        sync_layout.addWidget(sync_server_btn)
+        layout.addLayout(sync_layout)
+        if self.instrumentation is not None:
+            stats_btn = QPushButton("Performance Stats...")
+            stats_btn.clicked.connect(lambda: InstrumentationDialog(self.instrumentation, self).exec_())
+            layout.addWidget(stats_btn)
+        self.db.submit("get_meta", "archive_after_days", "30",
+                       callback=lambda days: self.archive_days.setValue(int(days)))
         layout.addStretch()
         self.settings_tab.setLayout(layout)
 
+    def toggle_archive(self, show):
+        """Switch the Completed tab between recent and archived tasks."""
+        if show and self.archive_view is None:
+            self.archive_view = PagedTaskListView(self, self.archive_list, archived=True)
+            self.archive_view.reset()
+        self.completed_list.setVisible(not show)
+        self.archive_list.setVisible(show)
+        self.archive_btn.setText("Show Recent" if show else "Show Archive")
+
+    def set_archive_age(self):
+        """Store the archive age and archive anything that is now past it."""
+        self.db.submit("set_meta", "archive_after_days", str(self.archive_days.value()))
+        self.db.submit("archive_completed_tasks", callback=self.on_tasks_archived)
+
+    def on_tasks_archived(self, moved):
+        """Reload the completed views after tasks moved to the archive."""
+        if moved:
+            self.refresh_completed_tasks()
+            if self.archive_view is not None:
+                self.archive_view.reset()
+            self.update_home_stats()
+
+    def import_tasks(self):
+        """Import tasks from a CSV, JSON Lines or iCalendar file."""
+        path, _ = QFileDialog.getOpenFileName(self, "Import Tasks", "", "Task files (*.csv *.jsonl *.ndjson *.ics)")
+        if path:
+            self.run_transfer("Importing tasks...", "import_tasks", path, self.on_tasks_imported)
+
+    def export_tasks(self):
+        """Export all tasks to a CSV, JSON Lines or iCalendar file."""
+        path, _ = QFileDialog.getSaveFileName(self, "Export Tasks", "tasks.csv",
+                                              "CSV (*.csv);;JSON Lines (*.jsonl);;iCalendar (*.ics)")
+        if path:
+            self.run_transfer("Exporting tasks...", "export_tasks", path,
+                              lambda count: self.statusBar().showMessage(f"Exported {count} tasks", 5000))
+
+    def run_transfer(self, label, method, path, callback):
+        """Run a bulk import/export on the worker behind a progress dialog."""
+        self.transfer_dialog = QProgressDialog(label, None, 0, 100, self)
+        self.transfer_dialog.setWindowModality(Qt.WindowModal)
+        self.transfer_dialog.setMinimumDuration(300)
+        self.db.progress.connect(self.on_transfer_progress)
+
+        def finished(result):
+            self.end_transfer()
+            callback(result)
+
+        def failed(error):
+            self.end_transfer()
+            self.show_db_error(method, error)
+        self.db.submit(method, path, progress=self.db.progress.emit, callback=finished, errback=failed)
+
+    def on_transfer_progress(self, done, percent):
+        """Advance the import/export progress dialog."""
+        self.transfer_dialog.setValue(percent)
+
+    def end_transfer(self):
+        """Close the import/export progress dialog."""
+        self.db.progress.disconnect(self.on_transfer_progress)
+        self.transfer_dialog.close()
+
+    def sync_with_file(self):
+        """Sync with another todo.db, e.g. one on a shared drive."""
+        path, _ = QFileDialog.getOpenFileName(self, "Sync with Database", "", "Databases (*.db)")
+        if path:
+            self.run_sync(path)
+
+    def sync_with_server(self):
+        """Sync with a copy of the app running --serve-sync."""
+        address, ok = QInputDialog.getText(self, "Sync with Server", "Server (host:port):",
+                                           text=f"localhost:{DEFAULT_SYNC_PORT}")
+        if ok and address.strip():
+            self.run_sync(address.strip())
+
+    def run_sync(self, address):
+        """Run a sync on the database thread and reload the views once it is done."""
+        self.statusBar().showMessage(f"Syncing with {address}...")
+        self.db.submit("sync", address, callback=self.on_synced,
+                       errback=lambda error: self.show_db_error("sync", error))
+
+    def on_synced(self, result):
+        """Report a finished sync; the views only need rebuilding if something changed here."""
+        self.statusBar().showMessage(f"Sync done: sent {result['sent']} changes, "
+                                     f"applied {result['applied']} of {result['received']} received", 5000)
+        if result["applied"]:
+            self.refresh_all()
+
+    def on_tasks_imported(self, count):
+        """Bulk imports touch many rows, so rebuild every view once."""
+        self.statusBar().showMessage(f"Imported {count} tasks", 5000)
+        self.refresh_all()
+
+    def accepts_open_task(self, task):
+        """Whether an open task passes the Tasks tab category, due date and search filters."""
+        category = self.filter_combo.currentText()
+        due_window = self.due_window()
+        return (task.completed == 0 and (category == "All" or task.category == category)
+                and (due_window is None or due_window[0] <= (task.next_due or "") <= due_window[1])
+                and (self.search_ids is None or task.id in self.search_ids))
+
+    def due_window(self):
+        """The (first, last) next_due dates selected in the due filter, or None for any time."""
+        choice = self.due_filter_combo.currentText()
+        if choice == "Any Time":
+            return None
+        today = date.today()
+        days = 0 if choice == "Due Today" else 6
+        return today.isoformat(), (today + timedelta(days=days)).isoformat()
+
     def add_task(self):
         """Open dialog to add a new task."""
         dialog = TaskDialog(parent=self)
         if dialog.exec_():
-            title, category, due_date, is_daily = dialog.get_data()
-            self.db.add_task(title, category, due_date, is_daily)
-            self.refresh_all()
+            title, category, due_date, recurrence = dialog.get_data()
+            self.db.submit("add_task", title, category, due_date, bool(recurrence), recurrence or None,
+                           callback=self.task_changed.emit)
             self.animate_task_added()
 
+    def update_task(self, task_id, title, category, due_date, recurrence):
+        """Save edits to a task; recurrence is an RRULE or "" to make it a one-off task."""
+        self.db.submit("update_task", task_id, title, category, due_date, recurrence=recurrence,
+                       callback=self.task_changed.emit)
+
+    def delete_task(self, task_id):
+        """Delete a task."""
+        self.db.submit("delete_task", task_id, callback=self.task_changed.emit)
+
+    def set_daily_completed(self, task_id, done):
+        """Mark or unmark a daily task as done for today."""
+        method = "mark_daily_completed" if done else "clear_daily_completion"
+        self.db.submit(method, task_id, callback=self.task_changed.emit)
+
     def refresh_tasks(self):
-        """Refresh task list based on filter."""
-        self.task_list.clear()
+        """Refresh task list based on filter and search text."""
+        if self.task_view is None:
+            return
+        self.task_query += 1
+        query = self.task_query
+        text = self.search_input.text().strip()
+        due_window = self.due_window()
+        if not text:
+            if due_window is None:
+                self.stream_tasks(query, "iter_open_tasks", sort_key=TaskListView.default_sort_key)
+            else:
+                self.stream_tasks(query, "get_due_tasks", *due_window, sort_key=TaskListView.default_sort_key)
+            return
         category = self.filter_combo.currentText()
-        tasks = self.db.get_tasks(0)
-        if category != "All":
-            tasks = [t for t in tasks if t[2] == category]
-        for task in tasks:
-            item = QListWidgetItem(self.task_list)
-            task_widget = TaskItem(task, self)
-            item.setSizeHint(task_widget.sizeHint())
-            self.task_list.setItemWidget(item, task_widget)
-            task_widget.checkbox.stateChanged.connect(lambda: self.mark_task_completed(task[0]))
+        self.db.submit("search_tasks", text, 0, None if category == "All" else category,
+                       callback=lambda tasks: self.show_tasks(query, tasks, searching=True))
+
+    def show_tasks(self, query, tasks, sort_key=None, searching=False):
+        """Show the result of the latest Tasks tab query; superseded results are dropped."""
+        if query != self.task_query:
+            return
+        if searching:
+            self.search_ids = {task.id: rank for rank, task in enumerate(tasks)}
+            if sort_key is None:
+                # Search results keep their rank order unless sorted otherwise
+                sort_key = lambda task: self.search_ids.get(task.id, len(self.search_ids))
+        elif not self.search_input.text().strip():
+            self.search_ids = None
+        self.task_view.reload(tasks, sort_key)
+
+    def stream_tasks(self, query, method, *args, sort_key=None, **kwargs):
+        """Stream an unsearched Tasks tab query into the list, dropping it once superseded."""
+        if query != self.task_query:
+            return
+        self.search_ids = None
+        self.task_view.stream(method, *args, sort_key=sort_key, current=lambda: query == self.task_query,
+                              **kwargs)
 
     def refresh_daily_tasks(self):
         """Refresh daily tasks list."""
-        self.db.reset_daily_completion()  # Reset daily completion status
-        self.daily_list.clear()
-        tasks = self.db.get_tasks(is_daily=1)
-        for task in tasks:
-            item = QListWidgetItem(self.daily_list)
-            task_widget = TaskItem(task, self, show_daily_checkbox=True)
-            item.setSizeHint(task_widget.sizeHint())
-            self.daily_list.setItemWidget(item, task_widget)
-            task_widget.checkbox.stateChanged.connect(lambda: self.mark_task_completed(task[0]))
+        if self.daily_view is None:
+            return
+        self.daily_view.stream("iter_open_tasks", is_daily=1)
 
     def refresh_completed_tasks(self):
-        """Refresh completed tasks list."""
-        self.completed_list.clear()
-        tasks = self.db.get_tasks(1)
-        for task in tasks:
-            item = QListWidgetItem(self.completed_list)
-            task_widget = TaskItem(task, self)
-            item.setSizeHint(task_widget.sizeHint())
-            self.completed_list.setItemWidget(item, task_widget)
+        """Refresh completed tasks list from its first page."""
+        if self.completed_view is None:
+            return
+        self.completed_view.reset()
 
     def mark_task_completed(self, task_id):
-        """Mark task as fully completed and refresh lists."""
-        self.db.mark_completed(task_id)
-        self.refresh_all()
+        """Mark task as fully completed."""
+        self.db.submit("mark_completed", task_id, callback=self.task_changed.emit)
 
     def sort_tasks(self):
-        """Sort tasks by due date."""
-        self.task_list.clear()
-        tasks = self.db.get_tasks(0)
-        category = self.filter_combo.currentText()
-        if category != "All":
-            tasks = [t for t in tasks if t[2] == category]
-        tasks = sorted(tasks, key=lambda x: x[3] or "9999-12-31")
-        for task in tasks:
-            item = QListWidgetItem(self.task_list)
-            task_widget = TaskItem(task, self)
-            item.setSizeHint(task_widget.sizeHint())
-            self.task_list.setItemWidget(item, task_widget)
-            task_widget.checkbox.stateChanged.connect(lambda: self.mark_task_completed(task[0]))
+        """Sort tasks by due date, keeping to the search results while there is search text."""
+        self.task_query += 1
+        query = self.task_query
+        text = self.search_input.text().strip()
+        if text:
+            category = self.filter_combo.currentText()
+            self.db.submit("search_tasks", text, 0, None if category == "All" else category,
+                           callback=lambda tasks: self.show_tasks(query, tasks, self.due_date_sort_key, searching=True))
+            return
+        self.stream_tasks(query, "iter_open_tasks", order_by="next_due IS NULL, next_due, id",
+                          sort_key=self.due_date_sort_key)
+
+    @staticmethod
+    def due_date_sort_key(task):
+        """Order tasks by next due date, undated tasks last."""
+        return task.next_due or "9999-12-31"
+
+    def start_new_day(self):
+        """Reset daily completions at midnight and refresh the date-dependent views."""
+        # Requests run in order, so the refreshes below see the reset
+        self.db.submit("roll_daily_completion")
+        self.db.submit("archive_completed_tasks", callback=self.on_tasks_archived)
+        self.refresh_daily_tasks()
+        self.update_home_stats()
+        self.reload_reminders()  # recurring tasks rolled over to new occurrences
+
+    def show_db_error(self, method, error):
+        """Report a failed database request."""
+        QMessageBox.warning(self, "Database Error", f"{method} failed: {error}")
+
+    def apply_change(self, change):
+        """Patch every view affected by a single task change."""
+        for view in self.views():
+            view.apply(change)
+        if self.search_ids is not None:
+            self.search_timer.start()  # re-rank the search results
+        self.reminders.update(change.task_id, change.task)
+        self.update_home_stats()
+
+    def views(self):
+        """The task list views of the tabs built so far."""
+        return [view for view in (self.task_view, self.daily_view, self.completed_view) if view is not None]
 
     def refresh_all(self):
-        """Refresh all task lists and home stats."""
+        """Rebuild all built task lists, home stats and reminders from the database."""
         self.refresh_tasks()
         self.refresh_daily_tasks()
         self.refresh_completed_tasks()
         self.update_home_stats()
+        self.reload_reminders()
+
+    def reload_reminders(self):
+        """Rebuild the reminder heap from every open task due today or later."""
+        self.db.submit("get_meta", "reminders_shown_through", "", callback=self.reminders.reset)
+        self.db.submit("get_upcoming_reminders", date.today().isoformat(), chunk_callback=self.reminders.add)
+
+    def show_reminders(self, tasks):
+        """Notify about tasks that just became due, through the system tray when there is one."""
+        self.db.submit("set_meta", "reminders_shown_through", self.reminders.shown_through.isoformat())
+        titles = ", ".join(task.title for task in tasks[:3]) + (f" and {len(tasks) - 3} more" if len(tasks) > 3 else "")
+        heading = "Task due today" if len(tasks) == 1 else f"{len(tasks)} tasks due today"
+        if self.tray_icon is None and QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray_icon = QSystemTrayIcon(self.windowIcon(), self)
+            self.tray_icon.show()
+        if self.tray_icon is not None:
+            self.tray_icon.showMessage(heading, titles)
+        else:
+            self.statusBar().showMessage(f"{heading}: {titles}")
+            QApplication.alert(self)
 
     def update_home_stats(self):
         """Update stats on home tab."""
-        layout = self.home_tab.layout()
-        stats = layout.itemAt(1).widget()
-        stats.setText(f"Tasks: {len(self.db.get_tasks(0))} | Daily: {len(self.db.get_tasks(is_daily=1))} | Completed: {len(self.db.get_tasks(1))}")
+        self.db.submit("get_stats", callback=self.show_home_stats)
+
+    def show_home_stats(self, stats):
+        """Render the counts returned by Database.get_stats."""
+        completed = f"{stats['completed']} (+{stats['archived']} archived)" if stats["archived"] else stats["completed"]
+        self.stats_label.setText(f"Tasks: {stats['open']} | Recurring: {stats['daily']} | Completed: {completed}")
+        self.due_stats_label.setText(f"Overdue: {stats['overdue']} | Due Today: {stats['due_today']} | "
+                                     f"Due This Week: {stats['due_this_week']}")
+        self.category_stats_label.setText("\n".join(
+            f"{category}: {row['open']} open, {row['completed']} completed"
+            for category, row in sorted(stats["by_category"].items())))
+
+    def closeEvent(self, event):
+        """Let the database worker finish pending writes before closing."""
+        self.db.stop()
+        if self.instrumentation is not None and self.instrumentation.dump_path:
+            self.instrumentation.dump()
+        super().closeEvent(event)
 
     def toggle_theme(self):
         """Toggle between light and dark themes."""
@@ -546,7 +2540,21 @@ class ToDoApp(QMainWindow):
         animation.start()
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = ToDoApp()
+    parser = argparse.ArgumentParser(description="To-Do List App")
+    parser.add_argument("--db", default="todo.db", help="database file (default: todo.db)")
+    parser.add_argument("--serve-sync", metavar="[HOST:]PORT",
+                        help="serve sync requests for the database instead of opening the window")
+    parser.add_argument("--instrument", action="store_true", default=bool(os.environ.get("TODO_INSTRUMENT")),
+                        help="record query and refresh timings (also enabled by TODO_INSTRUMENT=1)")
+    parser.add_argument("--slow-ms", type=float, default=100, help="log operations slower than this (default: 100)")
+    parser.add_argument("--slow-log", default="todo_slow.log", help="slow-operation log file (default: todo_slow.log)")
+    parser.add_argument("--stats-file", help="write the timings here as JSON on exit")
+    args, qt_args = parser.parse_known_args()
+    if args.serve_sync:
+        serve_sync(args.db, args.serve_sync)
+        sys.exit(0)
+    instrumentation = Instrumentation(args.slow_ms, args.slow_log, args.stats_file) if args.instrument else None
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = ToDoApp(args.db, instrumentation=instrumentation)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
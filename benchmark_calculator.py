@@ -0,0 +1,256 @@
+"""Headless benchmark for the calculator's expression engines.
+
+Usage:
+    python benchmark_calculator.py [--count 200] [--repeat 5] [--engines legacy,float,decimal,fraction]
+                                   [--digits 28] [--output results.json]
+
+Generates expression corpora (arithmetic chains, deep nesting, scientific
+functions, huge integer powers) and measures, for every engine, the parse
+and evaluate time per expression and the peak Python memory of one parse
+plus evaluation. "legacy" is the original string-replace + eval() path;
+the others are the Parser/compile_node engine in each number mode, with
+constant folding off so evaluation is actually measured. CPython's
+compile() still folds the legacy path's constant arithmetic, so its
+eval column covers only function calls and what it cannot fold. Prints
+a table, and the full JSON report to --output if given. No Tk window is
+created.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from statistics import median
+try:
+    import resource
+except ImportError:  # Windows; the report then has no max_rss_kib
+    resource = None
+
+import math
+import numpy as np
+
+import Calculator
+
+
+# Engines: each has parse(text) -> compiled and run(compiled) -> value
+LEGACY_REPLACEMENTS = [
+    ("sin(", "np.sin(np.radians("),
+    ("cos(", "np.cos(np.radians("),
+    ("tan(", "np.tan(np.radians("),
+    ("sqrt(", "np.sqrt("),
+    ("log10(", "np.log10("),
+]
+LEGACY_GLOBALS = {"np": np, "math": math}
+
+
+def legacy_translate(text):
+    """Apply the original calculate() replacements, closing the np.radians( they open.
+
+    The original left np.radians( unclosed, so every trig expression was a
+    SyntaxError; doubling the matching ")" keeps its cost measurable.
+    """
+    for old, new in LEGACY_REPLACEMENTS:
+        text = text.replace(old, new)
+    out = []
+    stack = []
+    for i, char in enumerate(text):
+        if char == "(":
+            stack.append(text.endswith("np.radians(", 0, i + 1))
+        elif char == ")" and stack and stack.pop():
+            # The extra ")" closes the np.sin( around np.radians( as well
+            stack.pop()
+            char = "))"
+        out.append(char)
+    return "".join(out)
+
+
+class LegacyEngine:
+    name = "legacy"
+
+    def parse(self, text):
+        return compile(legacy_translate(text), "<expression>", "eval")
+
+    def run(self, code):
+        return eval(code, LEGACY_GLOBALS)
+
+
+class CompiledEngine:
+    """Parser + compile_node in one number mode, bypassing compile_expression's cache.
+
+    Constant folding is off: the corpora have no variables, so folding
+    would turn every expression into a literal at parse time and leave
+    nothing to measure in eval.
+    """
+
+    def __init__(self, mode, digits):
+        self.name = mode
+        self.numbers = Calculator.number_system(mode, digits)
+
+    def parse(self, text):
+        function = Calculator.compile_node(Calculator.Parser(text, self.numbers, folding=False).parse(), self.numbers)
+        return Calculator.finishing(function, self.numbers.finish) if self.numbers.finish else function
+
+    def run(self, function):
+        return function({})
+
+
+def make_engine(name, digits):
+    if name == "legacy":
+        return LegacyEngine()
+    if name not in Calculator.NUMBER_MODES:
+        raise SystemExit(f"unknown engine {name!r}; choose from legacy, {', '.join(Calculator.NUMBER_MODES)}")
+    return CompiledEngine(name, digits)
+
+
+# Synthetic corpora, using only syntax both the legacy path and the parser accept
+def number(rng):
+    return str(rng.randint(1, 999)) if rng.random() < 0.6 else f"{rng.uniform(0.1, 999):.3f}"
+
+
+def arithmetic_chain(rng):
+    """20-60 numbers joined by + - * /."""
+    terms = [number(rng) for _ in range(rng.randint(20, 60))]
+    return "".join(term + rng.choice(" + - * / ".split()) for term in terms[:-1]) + terms[-1]
+
+
+def deep_nesting(rng):
+    """A binary expression nested 20-80 parentheses deep."""
+    text = number(rng)
+    for _ in range(rng.randint(20, 80)):
+        text = f"({text} {rng.choice('+-*')} {number(rng)})" if rng.random() < 0.5 else f"({number(rng)} + {text})"
+    return text
+
+
+def scientific(rng):
+    """Several nested trig, sqrt and log10 calls."""
+    def call(depth):
+        if depth == 0:
+            return number(rng)
+        function = rng.choice(["sin", "cos", "tan", "sqrt", "log10"])
+        if function in ("sqrt", "log10"):
+            # A positive number plus a square keeps the argument in the domain
+            return f"{function}({number(rng)} + ({call(depth - 1)})**2)"
+        return f"{function}({call(depth - 1)} {rng.choice('+*')} {number(rng)})"
+    return " + ".join(call(rng.randint(1, 4)) for _ in range(rng.randint(2, 5)))
+
+
+def huge_power(rng):
+    """Integer powers with tens of thousands of digits."""
+    base, exponent = rng.randint(2, 99), rng.randint(10_000, 60_000)
+    return rng.choice([
+        f"{base}**{exponent}",
+        f"{base}**{exponent} - {base}**{exponent // 2} * {rng.randint(2, 9)}",
+        f"({base}**{exponent} + 1) / {rng.randint(3, 9)}",
+    ])
+
+
+CORPORA = {
+    "arithmetic": arithmetic_chain,
+    "nested": deep_nesting,
+    "scientific": scientific,
+    "huge_power": huge_power,
+}
+
+
+# Measurement
+def measure(engine, texts, repeat):
+    """Median parse and evaluate time per expression over repeat passes, peak memory and error count."""
+    parse_times = []
+    eval_times = []
+    compiled = []
+    errors = 0
+    for _ in range(repeat):
+        compiled = []
+        errors = 0
+        start = time.perf_counter()
+        for text in texts:
+            try:
+                compiled.append(engine.parse(text))
+            except (SyntaxError, ValueError, ArithmeticError, RecursionError):
+                errors += 1
+        parse_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for code in compiled:
+            try:
+                engine.run(code)
+            except (ValueError, ArithmeticError, TypeError):
+                errors += 1
+        eval_times.append(time.perf_counter() - start)
+    peaks = []
+    for text in texts:
+        tracemalloc.start()
+        try:
+            engine.run(engine.parse(text))
+        except (SyntaxError, ValueError, ArithmeticError, RecursionError, TypeError):
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    count = len(texts)
+    return {
+        "parse_us": round(median(parse_times) / count * 1e6, 2),
+        "eval_us": round(median(eval_times) / count * 1e6, 2),
+        "peak_kib_median": round(median(peaks) / 1024, 1),
+        "peak_kib_max": round(max(peaks) / 1024, 1),
+        "errors": errors,
+    }
+
+
+def print_table(results, output=sys.stdout):
+    columns = [("corpus", "corpus", 12), ("engine", "engine", 9), ("parse_us", "parse µs", 10),
+               ("eval_us", "eval µs", 10), ("total_us", "total µs", 10), ("peak_kib_median", "peak KiB", 10),
+               ("peak_kib_max", "max KiB", 10), ("errors", "errors", 7)]
+    print("".join(title.rjust(width) if i > 1 else title.ljust(width)
+                  for i, (_, title, width) in enumerate(columns)), file=output)
+    for row in results:
+        print("".join(str(row[key]).rjust(width) if i > 1 else str(row[key]).ljust(width)
+                      for i, (key, _, width) in enumerate(columns)), file=output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the calculator's expression engines headlessly.")
+    parser.add_argument("--count", type=int, default=200, help="expressions per corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes over each corpus")
+    parser.add_argument("--engines", default="legacy," + ",".join(Calculator.NUMBER_MODES),
+                        help="comma-separated engines: legacy and/or number modes")
+    parser.add_argument("--corpora", default=",".join(CORPORA), help="comma-separated corpora to run")
+    parser.add_argument("--digits", type=int, default=Calculator.DEFAULT_DIGITS, help="precision for decimal modes")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for the corpora")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    engines = [make_engine(name, args.digits) for name in args.engines.split(",")]
+    # Python refuses to print ints over 4300 digits, but evaluating them is fine
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "count": args.count,
+        "repeat": args.repeat,
+        "digits": args.digits,
+        "results": [],
+    }
+    for corpus in args.corpora.split(","):
+        rng = random.Random(args.seed)
+        texts = [CORPORA[corpus](rng) for _ in range(args.count)]
+        for engine in engines:
+            result = measure(engine, texts, args.repeat)
+            result["total_us"] = round(result["parse_us"] + result["eval_us"], 2)
+            report["results"].append({"corpus": corpus, "engine": engine.name, **result})
+        print(f"{corpus}: done", file=sys.stderr)
+    if resource is not None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["max_rss_kib"] = max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+    print_table(report["results"])
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
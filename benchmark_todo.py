@@ -0,0 +1,240 @@
+"""Headless benchmark for the To-Do app's Database and task views.
+
+Usage:
+    python benchmark_todo.py [--sizes 1000,10000,100000] [--repeat 5] [--output results.json]
+
+Runs under QT_QPA_PLATFORM=offscreen against a temporary database and prints
+one JSON document with wall time, SQL statement counts and peak Python memory
+for each operation at each database size.
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import sqlite3
+import tempfile
+import tracemalloc
+from datetime import date, datetime, timedelta
+from statistics import median
+try:
+    import resource
+except ImportError:  # Windows; the report then has no max_rss_kib
+    resource = None
+
+from PyQt5.QtCore import QCoreApplication, QEvent, QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+import ToDo
+
+
+# Database that counts every SQL statement it executes
+class CountingDatabase(ToDo.Database):
+    def __init__(self, db_name="todo.db"):
+        self.queries = 0
+        super().__init__(db_name)
+
+    def create_tables(self):
+        self.conn.set_trace_callback(self.count_query)
+        super().create_tables()
+
+    def count_query(self, statement):
+        self.queries += 1
+
+    def query_count(self):
+        """Statements executed so far; submitted through the worker, so it runs on its thread."""
+        return self.queries
+
+
+# Synthetic data
+def seed_database(path, size, rng):
+    """Fill a fresh database with size synthetic tasks in one transaction."""
+    db = ToDo.Database(path)
+    today = date.today()
+    categories = ["Work", "Personal", "Urgent", "Other", None]
+    rules = [None] * 9 + ["FREQ=DAILY", "FREQ=WEEKLY;BYDAY=MO", "FREQ=MONTHLY;BYMONTHDAY=1"]
+    rows = []
+    for i in range(size):
+        created = datetime.now() - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86400))
+        created_at = created.strftime("%Y-%m-%d %H:%M:%S")
+        due_date = (today + timedelta(days=rng.randint(-30, 60))).isoformat() if rng.random() < 0.8 else None
+        recurrence = rng.choice(rules)
+        completed = int(recurrence is None and rng.random() < 0.3)
+        # Completions stay inside the default 30-day archive window so startup doesn't archive them
+        completed_at = ((datetime.now() - timedelta(days=rng.randint(0, 20))).strftime("%Y-%m-%d %H:%M:%S")
+                        if completed else None)
+        rows.append((f"Synthetic task {i} {rng.choice(['report', 'email', 'groceries', 'meeting', 'review'])}",
+                     rng.choice(categories), due_date, completed, created_at, int(bool(recurrence)), completed_at,
+                     recurrence, ToDo.schedule_next_due(due_date, recurrence, created_at)))
+    db.cursor.executemany('''
+        INSERT INTO tasks (title, category, due_date, completed, created_at, is_daily, completed_at, recurrence, next_due)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    db.conn.commit()
+    db.conn.close()
+
+
+# Measurement helpers
+def measure(operation, repeat, queries=lambda: 0, setup=None):
+    """Time operation() repeat times, then run it once more under tracemalloc for peak memory."""
+    times = []
+    query_counts = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        before = queries()
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+        query_counts.append(queries() - before)
+    if setup:
+        setup()
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms_median": round(median(times) * 1000, 3),
+        "wall_ms_min": round(min(times) * 1000, 3),
+        "queries": int(median(query_counts)),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def wait_idle(app, window):
+    """Process events until the database worker has delivered every pending result."""
+    while window.db.pending:
+        app.processEvents(QEventLoop.AllEvents, 50)
+    app.processEvents()
+    # Outside exec_() deleteLater() never runs on its own, so replaced row widgets would pile up
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+def benchmark_database(path, size, repeat, rng):
+    """Time Database methods directly, without Qt."""
+    db = CountingDatabase(path)
+    results = {}
+    results["get_tasks(open)"] = measure(lambda: db.get_tasks(0), repeat, lambda: db.queries)
+    results["get_tasks(completed)"] = measure(lambda: db.get_tasks(1), repeat, lambda: db.queries)
+    results["get_stats"] = measure(db.get_stats, repeat, lambda: db.queries)
+    results["add_task"] = measure(lambda: db.add_task("Benchmark task", "Work", date.today().isoformat(), False),
+                                  repeat, lambda: db.queries)
+    db.cursor.execute("SELECT id FROM tasks WHERE completed = 0")
+    open_ids = [row[0] for row in db.cursor.fetchall()]
+    rng.shuffle(open_ids)
+    results["mark_completed"] = measure(lambda: db.mark_completed(open_ids.pop()), repeat, lambda: db.queries)
+    db.conn.close()
+    return results
+
+
+def benchmark_app(app, path, repeat):
+    """Time ToDoApp startup, first tab activations and full refresh paths against a seeded database."""
+    results = {}
+    windows = []
+
+    def open_window():
+        window = ToDo.ToDoApp(path, database_class=CountingDatabase)
+        window.show()
+        app.processEvents()  # first paint; queues the startup queries
+        windows.append(window)
+        return window
+
+    def startup():
+        wait_idle(app, open_window())
+
+    def close_windows():
+        while windows:
+            window = windows.pop()
+            window.close()
+            window.deleteLater()
+        app.processEvents()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def fresh_window():
+        close_windows()
+        wait_idle(app, open_window())
+
+    def open_tabs():
+        window = windows[-1]
+        for index in range(window.tabs.count()):
+            window.tabs.setCurrentIndex(index)
+            wait_idle(app, window)
+
+    # A fresh window's counter starts at zero, so its reading afterwards is the cost of getting there
+    results["first_paint"] = measure(open_window, repeat, setup=close_windows)
+    results["startup"] = measure(startup, repeat, lambda: worker_queries(app, windows[-1]) if windows else 0,
+                                 setup=close_windows)
+    results["open_tabs"] = measure(open_tabs, repeat, lambda: worker_queries(app, windows[-1]), setup=fresh_window)
+    window = windows[-1]
+    queries = lambda: worker_queries(app, window)
+
+    def refresh_all():
+        window.refresh_all()
+        wait_idle(app, window)
+
+    def sort_tasks():
+        window.sort_tasks()
+        wait_idle(app, window)
+
+    results["refresh_all"] = measure(refresh_all, repeat, queries)
+    results["sort_tasks"] = measure(sort_tasks, repeat, queries)
+    close_windows()
+    return results
+
+
+def worker_queries(app, window):
+    """Read the statement counter of the database owned by the app's worker thread."""
+    box = []
+    window.db.submit("query_count", callback=box.append)
+    wait_idle(app, window)
+    return box[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the To-Do app's database and views headlessly.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated task counts to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for synthetic data")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    report = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(size) for size in args.sizes.split(",")):
+            rng = random.Random(args.seed)
+            path = os.path.join(directory, f"bench_{size}.db")
+            start = time.perf_counter()
+            seed_database(path, size, rng)
+            seed_ms = round((time.perf_counter() - start) * 1000, 3)
+            operations = benchmark_database(path, size, args.repeat, rng)
+            operations.update(benchmark_app(app, path, args.repeat))
+            for name, result in operations.items():
+                report["results"].append({"size": size, "operation": name, **result})
+            report["results"].append({"size": size, "operation": "seed", "wall_ms_median": seed_ms})
+            print(f"size {size}: done", file=sys.stderr)
+    if resource is not None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["max_rss_kib"] = max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()